@@ -1,8 +1,23 @@
-import streamlit as st
-import tensorflow as tf
+import atexit
+import json
+
 import numpy as np
+import streamlit as st
 from PIL import Image
-import streamlit.components.v1 as components
+
+import bins_view
+import cascade
+import classifier
+import event_store
+import inference_service
+import metrics
+import model_loader
+import motion_gate
+import multi_item
+import prediction_cache
+import preprocessing
+import streaming
+from classifier import CLASS_NAMES
 
 # Page config
 st.set_page_config(page_title="Smart Waste Classifier", layout="wide")
@@ -53,25 +68,128 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Load model
-# NOTE: Ensure this path matches your folder structure exactly
-MODEL_PATH = "waste-classification-cnn-model-tensorflow1-default-v1/Waste-Classification-CNN-Model.h5"
+# NOTE: MODEL_PATH lives in classifier.py so the batch tools share it.
+# Set AIRWASTE_BACKEND=tflite to run the converted model (see convert_tflite.py).
+# TensorFlow import, model load and warm-up run in a background thread so the
+# page renders straight away; the script polls the loader and reruns when ready.
+@st.cache_resource
+def get_model_loader():
+    return model_loader.ModelLoader().start()
+
+# Near-duplicate frames (retries, the same item held up twice) reuse the
+# earlier prediction; one cache is shared by all sessions. Off unless
+# AIRWASTE_CACHE_DISTANCE > 0 (see prediction_cache.CACHE_ENABLED).
+@st.cache_resource
+def get_prediction_cache():
+    return prediction_cache.PredictionCache() if prediction_cache.CACHE_ENABLED else None
+
+# Every session talks to one micro-batching service instead of calling the
+# model directly, so concurrent frames share predict() calls
+@st.cache_resource
+def get_inference_service(_model):
+    return inference_service.InferenceService(_model).start()
 
+# Optional Prometheus / JSON endpoint (AIRWASTE_METRICS_PORT), started once per process
 @st.cache_resource
-def load_model():
-    try:
-        model = tf.keras.models.load_model(MODEL_PATH)
-        return model, None
-    except Exception as e:
-        return None, str(e)
+def start_metrics_server():
+    return metrics.serve() if metrics.METRICS_PORT else None
 
-model, error = load_model()
+# Every classification is appended to the on-disk event log read by the
+# dashboard page (pages/); AIRWASTE_EVENTS=0 turns it off
+@st.cache_resource
+def get_event_log():
+    if not event_store.ENABLED:
+        return None
+    events = event_store.EventLog()
+    atexit.register(events.close)
+    return events
+
+loader = get_model_loader()
+model, error = loader.result() if loader.done else (None, None)
+cache = get_prediction_cache()
+if cache is not None:
+    metrics.register_collector("cache", cache.stats)
+start_metrics_server()
+events = get_event_log()
+if events is not None:
+    metrics.register_collector("events", events.stats)
 
 if error:
     st.error(f"Error loading model: {error}")
     st.warning("Please check if the model file path is correct.")
     st.stop()
+elif model is None:
+    st.info(f"Loading model ({loader.phase.replace('_', ' ')})... the page will update when it is ready.")
 else:
-    st.success(f"Model loaded successfully!")
+    model = get_inference_service(model)
+    metrics.register_collector("service", model.stats)
+    if hasattr(model.model, "stats"):
+        # worker_pool.WorkerPool / cascade.CascadeModel: their own counters
+        metrics.register_collector("backend", model.model.stats)
+    startup = ", ".join(f"{name.replace('_', ' ')} {ms / 1000:.1f}s" for name, ms in loader.phases.items())
+    st.success(f"Model loaded successfully! ({model.name} backend)")
+    if loader.export_ms is not None:
+        startup += f" · SavedModel export {loader.export_ms / 1000:.1f}s (after startup)"
+    st.caption(f"Startup: {startup}")
+
+with st.sidebar.expander("Prediction cache"):
+    if cache is None:
+        st.caption(
+            "Off (default). Set AIRWASTE_CACHE_DISTANCE > 0 to reuse predictions for near-duplicate frames; "
+            "a higher tolerance raises the hit rate but can return another item's verdict."
+        )
+    else:
+        cache_stats = cache.stats()
+        st.metric("Hit rate", f"{cache_stats['cache_hit_rate'] * 100:.1f}%")
+        st.caption(
+            f"{cache_stats['cache_hits']} exact / {cache_stats['cache_near_hits']} near hits, "
+            f"{cache_stats['cache_misses']} misses, {cache_stats['cache_evictions']} evictions · "
+            f"{cache_stats['cache_size']}/{cache_stats['cache_capacity']} entries · "
+            f"tolerance {cache.max_distance} bits"
+        )
+        if st.button("Clear cache"):
+            cache.clear()
+
+if model is not None:
+    with st.sidebar.expander("Inference service"):
+        service_stats = model.stats()
+        st.caption(
+            f"{service_stats['service_requests']} requests in {service_stats['service_batches']} batches "
+            f"(mean batch {service_stats['service_mean_batch_size']:.1f}) · "
+            f"queue {service_stats['service_queue_depth']} · rejected {service_stats['service_rejected']}"
+        )
+        st.caption(
+            f"Latency p50 {service_stats['service_latency_p50_ms']:.0f} ms · "
+            f"p95 {service_stats['service_latency_p95_ms']:.0f} ms · "
+            f"p99 {service_stats['service_latency_p99_ms']:.0f} ms"
+        )
+    if isinstance(model.model, cascade.CascadeModel):
+        with st.sidebar.expander("Model cascade"):
+            cascade_stats = model.model.stats()
+            st.metric("Fast-tier hit rate", f"{cascade_stats['cascade_fast_hit_rate'] * 100:.1f}%")
+            st.caption(
+                f"{cascade_stats['cascade_fast_hits']} fast / {cascade_stats['cascade_escalations']} full · "
+                f"threshold {model.model.threshold:.2f} · "
+                f"agreement with full model {cascade_stats['cascade_agreement_rate'] * 100:.1f}% "
+                f"({cascade_stats['cascade_audits']} audited)"
+            )
+            st.caption(
+                f"{cascade_stats['cascade_fast_ms_per_image']:.1f} ms fast vs "
+                f"{cascade_stats['cascade_full_ms_per_image']:.1f} ms full per image · "
+                f"saved {cascade_stats['cascade_latency_saved_ms'] / 1000:.1f}s of inference"
+            )
+
+# Filled in after this run's prediction so it includes it
+show_diagnostics = metrics.REGISTRY.enabled and st.sidebar.checkbox("Show diagnostics", key="diagnostics")
+diagnostics_placeholder = st.sidebar.empty()
+
+# Input mode: still snapshots, or a continuous camera / video / RTSP feed
+STREAM_REFRESH_SECONDS = 0.25
+mode = st.sidebar.radio("Input mode", ["Snapshot", "Stream"], key="mode")
+stream = st.session_state.get("stream")
+if mode != "Stream" and stream is not None:
+    stream.stop()
+    stream = st.session_state["stream"] = None
 
 # Layout Columns
 col1, col2 = st.columns([1, 1], gap="large")
@@ -85,7 +203,36 @@ with col1:
         <h3 style="margin: 0;">Webcam Feed</h3>
     </div>
     """, unsafe_allow_html=True)
-    camera_image = st.camera_input("Point camera at waste item", key="camera")
+    camera_image = None
+    multi_mode = "Off"
+    if mode == "Snapshot":
+        camera_image = st.camera_input("Point camera at waste item", key="camera")
+        # Several items in one photo: classify regions of the full-resolution frame in one batch
+        multi_mode = st.sidebar.selectbox("Multi-item detection", ["Off", "Tiles", "Contours"], key="multi_mode")
+    else:
+        source = st.text_input("Video source (camera index, file path or stream URL)", value="0", key="stream_source")
+        # Only run the CNN when a new item has settled in view
+        use_gate = st.sidebar.checkbox("Motion gating", value=True, key="gate_enabled")
+        gate_method = st.sidebar.selectbox("Gate method", ["diff", "mog2"], key="gate_method",
+                                           index=["diff", "mog2"].index(motion_gate.GATE_METHOD))
+        gate_ratio = st.sidebar.slider("Changed-pixel ratio", 0.0, 0.2, motion_gate.GATE_MOTION_RATIO, 0.005, key="gate_ratio")
+        gate_settle = st.sidebar.slider("Settle frames", 1, 30, motion_gate.GATE_SETTLE_FRAMES, key="gate_settle")
+        start_col, stop_col = st.columns(2)
+        if start_col.button("Start stream", disabled=model is None or (stream is not None and stream.running)):
+            try:
+                gate = motion_gate.MotionGate(gate_method, motion_ratio=gate_ratio, settle_frames=gate_settle) if use_gate else None
+                st.session_state.pop("stream_seq", None)
+                stream = st.session_state["stream"] = streaming.StreamClassifier(
+                    model, source, gate=gate, cache=cache, events=events).start()
+            except Exception as e:
+                st.error(str(e))
+        if stop_col.button("Stop stream", disabled=stream is None):
+            stream.stop()
+            stream = st.session_state["stream"] = None
+        frame_placeholder = st.empty()
+        stream_stats_placeholder = st.empty()
+        if stream is not None and not stream.running and stream.error:
+            st.error(f"Stream stopped: {stream.error}")
 
 with col2:
     st.markdown("""
@@ -98,285 +245,12 @@ with col2:
     """, unsafe_allow_html=True)
     result_placeholder = st.empty()
 
-# Smart Bins Placeholder
-st.markdown("""
-<div style="display: flex; align-items: center; margin: 2rem 0 1rem 0;">
-    <svg width="24" height="24" viewBox="0 0 24 24" fill="#667eea" style="margin-right: 8px;">
-        <path d="M9,3V4H4V6H5V19A2,2 0 0,0 7,21H17A2,2 0 0,0 19,19V6H20V4H15V3H9M7,6H17V19H7V6M9,8V17H11V8H9M13,8V17H15V8H13Z"/>
-    </svg>
-    <h3 style="margin: 0;">Smart Bins</h3>
-</div>
-""", unsafe_allow_html=True)
-bins_placeholder = st.empty()
-
-# Function to display bins with Updated SVGs
-def display_bins(predicted_class, confidence):
-    organic_active = "active" if predicted_class == "Organic" else ""
-    recyclable_active = "active" if predicted_class == "Recyclable" else ""
-    
-    html_code = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-        body {{
-            padding: 20px;
-            background: transparent;
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-        }}
-        .container {{
-            display: flex;
-            justify-content: center;
-            align-items: flex-end;
-            gap: 60px;
-            max-width: 800px;
-            margin: 0 auto;
-        }}
-        
-        .bin {{
-            width: 200px;
-            position: relative;
-            transition: all 0.3s ease;
-        }}
-        
-        .bin-wrapper {{
-            position: relative;
-            height: 300px;
-        }}
-        
-        .bin-body {{
-            width: 100%;
-            height: 240px;
-            background: linear-gradient(145deg, #2a5c2a, #1a3d1a);
-            border-radius: 15px 15px 25px 25px;
-            position: absolute;
-            bottom: 0;
-            box-shadow: 0 15px 40px rgba(0,0,0,0.3);
-            transition: all 0.4s ease;
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            justify-content: center;
-            padding: 20px;
-        }}
-        
-        .bin-body.recyclable {{
-            background: linear-gradient(145deg, #2563eb, #1e40af);
-        }}
-        
-        .bin-lid {{
-            width: 100%;
-            height: 70px;
-            background: linear-gradient(145deg, #357535, #234d23);
-            border-radius: 15px 15px 8px 8px;
-            position: absolute;
-            top: 0;
-            transform-origin: top;
-            transition: transform 0.6s cubic-bezier(0.68, -0.55, 0.265, 1.55);
-            box-shadow: 0 8px 20px rgba(0,0,0,0.3);
-            z-index: 10;
-        }}
-        
-        .bin-lid.recyclable {{
-            background: linear-gradient(145deg, #3b82f6, #2563eb);
-        }}
-        
-        .bin-lid::before {{
-            content: '';
-            position: absolute;
-            width: 70px;
-            height: 18px;
-            background: linear-gradient(145deg, #2a2a2a, #1a1a1a);
-            top: 25px;
-            left: 50%;
-            transform: translateX(-50%);
-            border-radius: 8px;
-            box-shadow: inset 0 2px 4px rgba(0,0,0,0.5);
-        }}
-        
-        .bin.active .bin-lid {{
-            transform: rotateX(-130deg);
-        }}
-        
-        .bin-label {{
-            color: white;
-            font-size: 22px;
-            font-weight: 700;
-            text-transform: uppercase;
-            letter-spacing: 2px;
-            text-shadow: 2px 2px 4px rgba(0,0,0,0.5);
-            margin-top: 15px;
-        }}
-        
-        .bin-icon {{
-            width: 80px;
-            height: 80px;
-            filter: drop-shadow(3px 3px 6px rgba(0,0,0,0.3));
-        }}
-        
-        @keyframes pulse {{
-            0%, 100% {{ transform: scale(1); }}
-            50% {{ transform: scale(1.1); }}
-        }}
-        
-        .bin.active {{
-            animation: pulse 0.6s ease-in-out;
-        }}
-        
-        .bin.active .bin-body {{
-            box-shadow: 0 15px 50px rgba(34, 197, 94, 0.5);
-        }}
-        
-        .bin.active .bin-body.recyclable {{
-            box-shadow: 0 15px 50px rgba(37, 99, 235, 0.5);
-        }}
-        
-        .bin-status {{
-            position: absolute;
-            top: -40px;
-            width: 100%;
-            text-align: center;
-            font-size: 16px;
-            font-weight: 700;
-            color: #22c55e;
-            opacity: 0;
-            transition: opacity 0.3s ease;
-            text-shadow: 0 2px 4px rgba(0,0,0,0.2);
-        }}
-        
-        .bin.active .bin-status {{
-            opacity: 1;
-        }}
-        
-        .confidence-badge {{
-            position: absolute;
-            bottom: -35px;
-            left: 50%;
-            transform: translateX(-50%);
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 8px 20px;
-            border-radius: 20px;
-            font-size: 14px;
-            font-weight: 600;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.2);
-            opacity: 0;
-            transition: opacity 0.3s ease;
-        }}
-        
-        .bin.active .confidence-badge {{
-            opacity: 1;
-        }}
-    </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="bin {organic_active}">
-                <div class="bin-status">
-                    <svg width="20" height="20" viewBox="0 0 24 24" fill="#22c55e" style="vertical-align: middle; margin-right: 4px;">
-                        <path d="M21,7L9,19L3.5,13.5L4.91,12.09L9,16.17L19.59,5.59L21,7Z"/>
-                    </svg>
-                    BIN OPENED
-                </div>
-                <div class="bin-wrapper">
-                    <div class="bin-lid"></div>
-                    <div class="bin-body">
-                        <svg class="bin-icon" version="1.1" xmlns="http://www.w3.org/2000/svg" width="45" height="47" viewBox="0 0 45 47">
-                            <path d="M0 0 C0.51219785 12.13624352 0.69734757 22.60197737 -7.375 32.5 C-12.78392802 38.15163633 -18.29254889 39.82345471 -25.9375 40.1875 C-29.59055213 40.15284106 -32.59148587 39.36340565 -36 38 C-36.66 40.97 -37.32 43.94 -38 47 C-39.65 47 -41.3 47 -43 47 C-43.66416927 35.43853499 -40.90836798 27.25587167 -34 18 C-38.39291786 21.31909349 -40.8227865 23.79887886 -43 29 C-43.66 28.67 -44.32 28.34 -45 28 C-45.75567555 14.04099327 -45.75567555 14.04099327 -41 8 C-34.41916064 1.59234063 -27.00635857 1.65986319 -18.3125 1.4375 C-16.24597747 1.37758232 -14.17955836 1.3139496 -12.11328125 1.24609375 C-11.20360596 1.22216553 -10.29393066 1.1982373 -9.35668945 1.17358398 C-6.00131026 0.92644065 -3.46910202 0 0 0 Z " fill="#FFFFFF" transform="translate(45,0)"/>
-                        </svg>
-                        <div class="bin-label">Organic</div>
-                    </div>
-                </div>
-                {"<div class='confidence-badge'>Confidence: " + f"{confidence:.1f}%" + "</div>" if organic_active else ""}
-            </div>
-            
-            <div class="bin {recyclable_active}">
-                <div class="bin-status">
-                    <svg width="20" height="20" viewBox="0 0 24 24" fill="#22c55e" style="vertical-align: middle; margin-right: 4px;">
-                        <path d="M21,7L9,19L3.5,13.5L4.91,12.09L9,16.17L19.59,5.59L21,7Z"/>
-                    </svg>
-                    BIN OPENED
-                </div>
-                <div class="bin-wrapper">
-                    <div class="bin-lid recyclable"></div>
-                    <div class="bin-body recyclable">
-                        <svg class="bin-icon" version="1.1" xmlns="http://www.w3.org/2000/svg" width="60" height="58" viewBox="0 0 60 58">
-                            <path d="M0 0 C0.87471834 1.36201818 1.72397503 2.74040563 2.5625 4.125 C3.03816406 4.89070313 3.51382813 5.65640625 4.00390625 6.4453125 C5.31222282 9.8007597 4.96911995 11.54696449 4 15 C2.44140625 18.17578125 2.44140625 18.17578125 0.5625 21.3125 C-0.05496094 22.36050781 -0.67242187 23.40851562 -1.30859375 24.48828125 C-3 27 -3 27 -5 28 C-7.6723621 28.13415472 -10.32250488 28.04318541 -13 28 C-13 29.65 -13 31.3 -13 33 C-16.30979968 30.18667027 -18.1048141 26.858057 -20 23 C-19.61842486 19.75984496 -18.19622523 17.45573113 -16.4375 14.75 C-15.98246094 14.04359375 -15.52742188 13.3371875 -15.05859375 12.609375 C-14.53458984 11.81273437 -14.53458984 11.81273437 -14 11 C-13.67 12.32 -13.34 13.64 -13 15 C-11.35 15 -9.7 15 -8 15 C-8.66 13.906875 -9.32 12.81375 -10 11.6875 C-11.58464929 9.06292462 -12 8.1743622 -12 5 C-10.56705502 4.15885829 -9.12845595 3.32734313 -7.6875 2.5 C-6.88699219 2.0359375 -6.08648437 1.571875 -5.26171875 1.09375 C-3 0 -3 0 0 0 Z " fill="#FFFFFF" transform="translate(51,23)"/>
-                            <path d="M0 0 C0.80759766 -0.03287109 1.61519531 -0.06574219 2.44726562 -0.09960938 C6.88873322 -0.1396226 8.64489187 0.01347967 12.26171875 2.83984375 C14.1875 5.4375 14.1875 5.4375 14.1875 7.4375 C15.8375 6.7775 17.4875 6.1175 19.1875 5.4375 C17.62108249 9.74514815 15.50413844 13.49921464 13.1875 17.4375 C8.5675 17.4375 3.9475 17.4375 -0.8125 17.4375 C0.1775 16.1175 1.1675 14.7975 2.1875 13.4375 C1.1975 12.4475 0.2075 11.4575 -0.8125 10.4375 C-1.080625 11.200625 -1.34875 11.96375 -1.625 12.75 C-2.8125 15.4375 -2.8125 15.4375 -5.8125 18.4375 C-9.1125 16.4575 -12.4125 14.4775 -15.8125 12.4375 C-13.42779746 2.89868985 -9.31065316 0.06592909 0 0 Z " fill="#FFFFFF" transform="translate(28.8125,6.5625)"/>
-                            <path d="M0 0 C4.44892584 -0.53466319 8.57357974 -0.79287006 13 0 C15.92858724 2.574868 17.57268544 5.38935038 19 9 C19 9.66 19 10.32 19 11 C16.525 10.505 16.525 10.505 14 10 C13.67 11.32 13.34 12.64 13 14 C16.3 14 19.6 14 23 14 C23 18.29 23 22.58 23 27 C10.63862416 27.49445503 10.63862416 27.49445503 7.78515625 25.28515625 C0 15.31947484 0 15.31947484 0 9.125 C0.81960435 6.5637364 1.61892259 4.30179569 3 2 C2.01 1.67 1.02 1.34 0 1 C0 0.67 0 0.34 0 0 Z " fill="#FFFFFF" transform="translate(5,24)"/>
-                        </svg>
-                        <div class="bin-label">Recyclable</div>
-                    </div>
-                </div>
-                {"<div class='confidence-badge'>Confidence: " + f"{confidence:.1f}%" + "</div>" if recyclable_active else ""}
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    return html_code
-
-# Real-time Prediction Process
-if camera_image is not None:
-    # Read Image
-    img = Image.open(camera_image)
-    
-    # Get model input shape
-    input_h, input_w, input_c = model.input_shape[1], model.input_shape[2], model.input_shape[3]
-    
-    # Convert based on channels
-    if input_c == 1:
-        img = img.convert("L")
-    else:
-        img = img.convert("RGB")
-    
-    # Resize
-    img_resized = img.resize((input_w, input_h))
-    
-    # Array conversion
-    img_array = np.array(img_resized) / 255.0
-    
-    # Add channel if grayscale
-    if input_c == 1:
-        img_array = np.expand_dims(img_array, axis=-1)
-    
-    # Add batch dimension
-    img_array = np.expand_dims(img_array, axis=0)
-    
-    # Predict
-    with st.spinner('Analyzing waste...'):
-        prediction = model.predict(img_array, verbose=0)[0]
-    
-    class_names = ["Organic", "Recyclable"]
-    predicted_idx = np.argmax(prediction)
-    predicted_label = class_names[predicted_idx]
-    confidence = float(prediction[predicted_idx] * 100)
-    
-    # Display Results
+# Result card, shared by snapshot and stream modes
+def show_result(predicted_label, confidence, prediction, overlay=None, caption=None):
     with result_placeholder.container():
-        # Icon SVG for result card (Simple style maintained for UI clarity)
-        if predicted_label == "Organic":
-            icon_svg = """
-            <svg class="bin-icon" version="1.1" xmlns="http://www.w3.org/2000/svg" width="45" height="47" viewBox="0 0 45 47">
-                <path d="M0 0 C0.51219785 12.13624352 0.69734757 22.60197737 -7.375 32.5 C-12.78392802 38.15163633 -18.29254889 39.82345471 -25.9375 40.1875 C-29.59055213 40.15284106 -32.59148587 39.36340565 -36 38 C-36.66 40.97 -37.32 43.94 -38 47 C-39.65 47 -41.3 47 -43 47 C-43.66416927 35.43853499 -40.90836798 27.25587167 -34 18 C-38.39291786 21.31909349 -40.8227865 23.79887886 -43 29 C-43.66 28.67 -44.32 28.34 -45 28 C-45.75567555 14.04099327 -45.75567555 14.04099327 -41 8 C-34.41916064 1.59234063 -27.00635857 1.65986319 -18.3125 1.4375 C-16.24597747 1.37758232 -14.17955836 1.3139496 -12.11328125 1.24609375 C-11.20360596 1.22216553 -10.29393066 1.1982373 -9.35668945 1.17358398 C-6.00131026 0.92644065 -3.46910202 0 0 0 Z " fill="#22c55e" transform="translate(45,0)"/>
-            </svg>
-            """
-            color = "#22c55e"
-        else:
-            icon_svg = """
-            <svg class="bin-icon" version="1.1" xmlns="http://www.w3.org/2000/svg" width="60" height="58" viewBox="0 0 60 58">
-                <path d="M0 0 C0.87471834 1.36201818 1.72397503 2.74040563 2.5625 4.125 C3.03816406 4.89070313 3.51382813 5.65640625 4.00390625 6.4453125 C5.31222282 9.8007597 4.96911995 11.54696449 4 15 C2.44140625 18.17578125 2.44140625 18.17578125 0.5625 21.3125 C-0.05496094 22.36050781 -0.67242187 23.40851562 -1.30859375 24.48828125 C-3 27 -3 27 -5 28 C-7.6723621 28.13415472 -10.32250488 28.04318541 -13 28 C-13 29.65 -13 31.3 -13 33 C-16.30979968 30.18667027 -18.1048141 26.858057 -20 23 C-19.61842486 19.75984496 -18.19622523 17.45573113 -16.4375 14.75 C-15.98246094 14.04359375 -15.52742188 13.3371875 -15.05859375 12.609375 C-14.53458984 11.81273437 -14.53458984 11.81273437 -14 11 C-13.67 12.32 -13.34 13.64 -13 15 C-11.35 15 -9.7 15 -8 15 C-8.66 13.906875 -9.32 12.81375 -10 11.6875 C-11.58464929 9.06292462 -12 8.1743622 -12 5 C-10.56705502 4.15885829 -9.12845595 3.32734313 -7.6875 2.5 C-6.88699219 2.0359375 -6.08648437 1.571875 -5.26171875 1.09375 C-3 0 -3 0 0 0 Z " fill="#2563eb" transform="translate(51,23)"/>
-                <path d="M0 0 C0.80759766 -0.03287109 1.61519531 -0.06574219 2.44726562 -0.09960938 C6.88873322 -0.1396226 8.64489187 0.01347967 12.26171875 2.83984375 C14.1875 5.4375 14.1875 5.4375 14.1875 7.4375 C15.8375 6.7775 17.4875 6.1175 19.1875 5.4375 C17.62108249 9.74514815 15.50413844 13.49921464 13.1875 17.4375 C8.5675 17.4375 3.9475 17.4375 -0.8125 17.4375 C0.1775 16.1175 1.1675 14.7975 2.1875 13.4375 C1.1975 12.4475 0.2075 11.4575 -0.8125 10.4375 C-1.080625 11.200625 -1.34875 11.96375 -1.625 12.75 C-2.8125 15.4375 -2.8125 15.4375 -5.8125 18.4375 C-9.1125 16.4575 -12.4125 14.4775 -15.8125 12.4375 C-13.42779746 2.89868985 -9.31065316 0.06592909 0 0 Z " fill="#2563eb" transform="translate(28.8125,6.5625)"/>
-                <path d="M0 0 C4.44892584 -0.53466319 8.57357974 -0.79287006 13 0 C15.92858724 2.574868 17.57268544 5.38935038 19 9 C19 9.66 19 10.32 19 11 C16.525 10.505 16.525 10.505 14 10 C13.67 11.32 13.34 12.64 13 14 C16.3 14 19.6 14 23 14 C23 18.29 23 22.58 23 27 C10.63862416 27.49445503 10.63862416 27.49445503 7.78515625 25.28515625 C0 15.31947484 0 15.31947484 0 9.125 C0.81960435 6.5637364 1.61892259 4.30179569 3 2 C2.01 1.67 1.02 1.34 0 1 C0 0.67 0 0.34 0 0 Z " fill="#2563eb" transform="translate(5,24)"/>
-            </svg>
-            """
-            color = "#2563eb"
+        # Icon SVG for result card (same paths as the bins, in the bin colour)
+        color = "#22c55e" if predicted_label == "Organic" else "#2563eb"
+        icon_svg = bins_view.icon_svg(predicted_label, color)
         
         st.markdown(f"""
         <div style="background: white; padding: 2rem; border-radius: 15px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); text-align: center;">
@@ -397,17 +271,109 @@ if camera_image is not None:
             <h4 style="margin: 0;">Detailed Probabilities</h4>
         </div>
         """, unsafe_allow_html=True)
-        for name, prob in zip(class_names, prediction):
+        for name, prob in zip(CLASS_NAMES, prediction):
             col_a, col_b = st.columns([4, 1])
             with col_a:
                 st.progress(float(prob))
             with col_b:
                 st.markdown(f"**{prob*100:.1f}%**")
             st.caption(name)
+        
+        if overlay is not None:
+            st.image(overlay, caption=caption, use_container_width=True)
+
+# Real-time Prediction Process
+verdict = ("", 0)
+trace_event = None
+if camera_image is not None and model is None:
+    with result_placeholder:
+        st.info("Model is still loading, your photo will be classified as soon as it is ready.")
+
+elif camera_image is not None and st.session_state.get("snapshot", {}).get("key") == (camera_image.file_id, multi_mode):
+    # st.camera_input returns the same photo on every rerun (sidebar widgets,
+    # cold-start rerun...): show the stored result instead of classifying and
+    # logging it again. Switching the multi-item mode re-classifies it.
+    snapshot = st.session_state["snapshot"]
+    show_result(snapshot["label"], snapshot["confidence"], snapshot["prediction"], snapshot["overlay"], snapshot["caption"])
+    verdict = (snapshot["label"], snapshot["confidence"])
+
+elif camera_image is not None:
+    metrics.inc("requests_total")
+    total_timer = metrics.timer("request")
+    with total_timer:
+        # Read Image
+        img = Image.open(camera_image)
+        
+        # Preprocess: reduced-size JPEG decode + float32 normalisation (see preprocessing.py)
+        with metrics.timer("preprocess") as preprocess_timer:
+            if multi_mode == "Off":
+                img_array = preprocessing.get_preprocessor(tuple(model.input_shape))(img, reuse=True)
+            else:
+                regions = multi_item.find_regions(img, multi_mode.lower())
+                region_batch = multi_item.preprocess_regions(img, regions, model.input_shape)
+        
+        # Predict (adds the batch dimension, skipped on a cache hit)
+        with st.spinner('Analyzing waste...'), metrics.timer("predict") as predict_timer:
+            try:
+                if multi_mode == "Off":
+                    prediction = prediction_cache.cached_predict(model, img_array, cache)
+                    item_predictions = [prediction]
+                else:
+                    # All regions in one predict call
+                    region_predictions = model.predict(region_batch)
+                    if multi_mode == "Tiles":
+                        # Tiles are overlapping pieces of one scene, not items:
+                        # their mean is the verdict and the single logged item
+                        prediction = region_predictions.mean(axis=0)
+                        item_predictions = [prediction]
+                    else:
+                        # Contour boxes are candidate items and each is logged;
+                        # the result card and bins follow the largest one rather
+                        # than a blend of a mixed pile
+                        prediction = region_predictions[multi_item.dominant_region(regions)]
+                        item_predictions = region_predictions
+            except inference_service.ServiceBusy:
+                metrics.inc("busy_rejections_total")
+                st.warning("The classifier is busy right now, please try again in a moment.")
+                st.stop()
+        
+        predicted_label, confidence = classifier.label_prediction(prediction)
+        metrics.inc("predictions_total", label=predicted_label)
+        
+        # Display Results
+        with metrics.timer("render_result") as result_timer:
+            overlay, caption = None, None
+            if multi_mode != "Off":
+                results = multi_item.label_regions(regions, region_predictions)
+                overlay = multi_item.draw_overlay(img, results)
+                caption = (f"{len(results)} tiles classified (overall result is their mean)" if multi_mode == "Tiles"
+                           else f"{len(results)} items classified (overall result is the largest item)")
+            show_result(predicted_label, confidence, prediction, overlay, caption)
+        
+        # Smart Bins Animation is updated below
+        verdict = (predicted_label, confidence)
     
-    # Display Smart Bins Animation
-    with bins_placeholder:
-        components.html(display_bins(predicted_label, confidence), height=400)
+    trace_event = {
+        "event": "classification",
+        "label": predicted_label,
+        "confidence": confidence,
+        "preprocess_ms": preprocess_timer.ms,
+        "predict_ms": predict_timer.ms,
+        "render_result_ms": result_timer.ms,
+        "total_ms": total_timer.ms,
+    }
+    # A photo re-classified in another multi-item mode is logged only once
+    if events is not None and st.session_state.get("snapshot", {}).get("key", (None,))[0] != camera_image.file_id:
+        for item_prediction in item_predictions:
+            events.append(item_prediction, stages=trace_event, source="snapshot")
+    st.session_state["snapshot"] = {
+        "key": (camera_image.file_id, multi_mode),
+        "label": predicted_label,
+        "confidence": confidence,
+        "prediction": np.array(prediction, copy=True),
+        "overlay": overlay,
+        "caption": caption,
+    }
     
 else:
     # Initial Instructions
@@ -421,9 +387,67 @@ else:
             <p style="margin: 0.5rem 0; opacity: 0.9;">Point your camera at the waste item to start real-time classification</p>
         </div>
         """, unsafe_allow_html=True)
-    
-    with bins_placeholder:
-        components.html(display_bins("", 0), height=400)
+
+# Smart Bins
+st.markdown("""
+<div style="display: flex; align-items: center; margin: 2rem 0 1rem 0;">
+    <svg width="24" height="24" viewBox="0 0 24 24" fill="#667eea" style="margin-right: 8px;">
+        <path d="M9,3V4H4V6H5V19A2,2 0 0,0 7,21H17A2,2 0 0,0 19,19V6H20V4H15V3H9M7,6H17V19H7V6M9,8V17H11V8H9M13,8V17H15V8H13Z"/>
+    </svg>
+    <h3 style="margin: 0;">Smart Bins</h3>
+</div>
+""", unsafe_allow_html=True)
+
+# Only the bins view reruns on a timer while streaming; the static bins page is
+# loaded once and each update just sends the active bin and confidence
+live = stream is not None and stream.running
+
+@st.fragment(run_every=STREAM_REFRESH_SECONDS if live else None)
+def live_view(stream, verdict):
+    if stream is not None:
+        # Keeps the stream alive; it stops itself once this session stops rendering
+        stream.touch()
+        stats = stream.snapshot()
+        result = stats["result"]
+        if stats["latest_frame"] is not None:
+            frame_placeholder.image(stats["latest_frame"], channels="BGR", use_container_width=True)
+        if result is not None:
+            verdict = (result["label"], result["confidence"])
+            if result["seq"] != st.session_state.get("stream_seq"):
+                st.session_state["stream_seq"] = result["seq"]
+                show_result(result["label"], result["confidence"], result["prediction"])
+        stream_stats_placeholder.caption(
+            f"Capture {stats['capture_fps']:.1f} FPS · Inference {stats['inference_fps']:.1f} FPS · "
+            f"Latency p50 {stats['latency_p50_ms']:.0f} ms / p95 {stats['latency_p95_ms']:.0f} ms · "
+            f"Dropped stale frames {stats['frames_dropped']}"
+            + (f" · Gate skipped {stats['gate_skipped']}/{stats['gate_frames']} frames "
+               f"({stats['gate_skip_ratio'] * 100:.0f}%)" if "gate_frames" in stats else "")
+        )
+        if live and not stream.running:
+            # Source ended or failed: full rerun to stop the timer and show why
+            st.rerun()
+    with metrics.timer("render_bins") as bins_timer:
+        bins_view.render_bins(*verdict)
+    return bins_timer.ms
+
+render_bins_ms = live_view(stream, verdict)
+if trace_event is not None:
+    metrics.trace({**trace_event, "render_bins_ms": render_bins_ms})
+
+# Diagnostics: per-stage latency and counters from metrics.py
+if show_diagnostics:
+    with diagnostics_placeholder.container():
+        snap = metrics.snapshot()
+        st.markdown("**Stage latency (ms)**")
+        st.table([
+            {"stage": name, "count": s["count"], "p50": round(s["p50_ms"], 2),
+             "p95": round(s["p95_ms"], 2), "p99": round(s["p99_ms"], 2)}
+            for name, s in sorted(snap["stages"].items())
+        ])
+        st.markdown("**Counters**")
+        st.json({**snap["counters"], **snap["gauges"]}, expanded=False)
+        st.download_button("Download metrics (JSON)", data=json.dumps(snap, indent=2),
+                           file_name="airwaste-metrics.json", mime="application/json")
 
 # Footer
 st.markdown("---")
@@ -436,4 +460,9 @@ st.markdown("""
     <p style="color: #666; font-size: 1.1rem; margin: 0.5rem 0;">Helping you sort waste correctly for a sustainable future</p>
     <p style="color: #888; font-size: 0.9rem; margin-top: 1rem;">The smart bins will automatically open based on detected waste type</p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Cold start: the shell above is already on screen; rerun once the model is ready
+if model is None:
+    loader.wait()
+    st.rerun()
@@ -0,0 +1,146 @@
+import os
+import shutil
+import threading
+
+import numpy as np
+
+import classifier
+from classifier import MODEL_PATH
+
+# Backend selection for app.py / batch tools, e.g. on the edge boxes:
+#   AIRWASTE_BACKEND=tflite AIRWASTE_TFLITE_THREADS=4 streamlit run app.py
+BACKEND = os.environ.get("AIRWASTE_BACKEND", "keras")
+TFLITE_PATH = os.environ.get("AIRWASTE_TFLITE_PATH", os.path.splitext(MODEL_PATH)[0] + ".tflite")
+TFLITE_THREADS = int(os.environ.get("AIRWASTE_TFLITE_THREADS", "0")) or None
+# Pre-converted SavedModel of the .h5, faster to load (see model_loader.py)
+SAVEDMODEL_PATH = os.environ.get("AIRWASTE_SAVEDMODEL_PATH", os.path.splitext(MODEL_PATH)[0] + "-savedmodel")
+
+BACKENDS = ("keras", "savedmodel", "tflite")
+
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, model):
+        self.model = model
+        self.input_shape = tuple(model.input_shape)
+
+    def predict(self, batch):
+        # Small batches skip predict()'s per-call data pipeline setup
+        if len(batch) <= 32:
+            return np.asarray(self.model(batch, training=False))
+        return self.model.predict(batch, batch_size=len(batch), verbose=0)
+
+
+class SavedModelBackend:
+    # Loads the exported serving graph directly: no Keras layer
+    # reconstruction, and the graph is already traced for any batch size
+    name = "savedmodel"
+
+    def __init__(self, path=SAVEDMODEL_PATH):
+        import tensorflow as tf
+
+        self._tf = tf
+        self.path = path
+        self._loaded = tf.saved_model.load(path)
+        self._serve = self._loaded.signatures["serving_default"]
+        self._input_name, spec = next(iter(self._serve.structured_input_signature[1].items()))
+        self.input_shape = tuple(spec.shape.as_list())
+
+    def predict(self, batch):
+        outputs = self._serve(**{self._input_name: self._tf.constant(batch, dtype=self._tf.float32)})
+        return next(iter(outputs.values())).numpy()
+
+
+def export_savedmodel(model, path=SAVEDMODEL_PATH):
+    import tensorflow as tf
+
+    spec = tf.TensorSpec([None, *model.input_shape[1:]], tf.float32, name="image")
+    module = tf.Module()
+    module.model = model
+    module.serve = tf.function(lambda image: {"probabilities": model(image, training=False)}, input_signature=[spec])
+    # Write next to the target and swap in, so a reader never sees half an export
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    tf.saved_model.save(module, tmp_path, signatures={"serving_default": module.serve})
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def savedmodel_is_fresh(path=SAVEDMODEL_PATH, model_path=MODEL_PATH):
+    graph = os.path.join(path, "saved_model.pb")
+    if not os.path.exists(graph):
+        return False
+    return not os.path.exists(model_path) or os.path.getmtime(graph) >= os.path.getmtime(model_path)
+
+
+def _tflite_interpreter(path, num_threads):
+    # Edge boxes can install the small tflite-runtime wheel instead of full TF
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=path, num_threads=num_threads)
+
+
+class TFLiteBackend:
+    name = "tflite"
+
+    def __init__(self, path=TFLITE_PATH, num_threads=TFLITE_THREADS):
+        self.path = path
+        self.num_threads = num_threads
+        self.interpreter = _tflite_interpreter(path, num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self.input_shape = (None,) + tuple(int(d) for d in self._input["shape"][1:])
+        self._batch_size = int(self._input["shape"][0])
+        # One interpreter is shared by every Streamlit session
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        if batch_size != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input["index"], [batch_size, *self.input_shape[1:]])
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch_size = batch_size
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            self._resize(len(batch))
+            scale, zero_point = self._input["quantization"]
+            if self._input["dtype"] != np.float32 and scale:
+                batch = np.round(batch / scale + zero_point)
+            self.interpreter.set_tensor(self._input["index"], batch.astype(self._input["dtype"]))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output["index"])
+            scale, zero_point = self._output["quantization"]
+            if self._output["dtype"] != np.float32 and scale:
+                output = (output.astype(np.float32) - zero_point) * scale
+            return np.array(output, dtype=np.float32)
+
+
+def load_backend(kind=BACKEND, model_path=MODEL_PATH, tflite_path=TFLITE_PATH, num_threads=TFLITE_THREADS,
+                 savedmodel_path=SAVEDMODEL_PATH):
+    if kind == "savedmodel":
+        try:
+            return SavedModelBackend(savedmodel_path), None
+        except Exception as e:
+            return None, f"{e} (build it with: python model_loader.py --export)"
+    if kind == "keras":
+        model, error = classifier.load_model(model_path)
+        if error:
+            return None, error
+        return KerasBackend(model), None
+    if kind == "tflite":
+        try:
+            return TFLiteBackend(tflite_path, num_threads), None
+        except Exception as e:
+            return None, f"{e} (build it with: python convert_tflite.py)"
+    return None, f"Unknown backend '{kind}', expected one of {', '.join(BACKENDS)}"
@@ -0,0 +1,215 @@
+"""Headless batch classification of archived bin-camera images.
+
+Example:
+    python batch_classify.py archive/2024-06-01 --output results.csv --batch-size 128 --workers 8
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from tqdm import tqdm
+
+import backends
+import classifier
+import preprocessing
+from classifier import CLASS_NAMES, MODEL_PATH
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# Marks the end of the batch queue
+_DONE = object()
+
+
+def iter_image_paths(inputs, file_list=None):
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                        yield os.path.join(root, name)
+        else:
+            yield item
+    if file_list:
+        with open(file_list) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+
+
+def _decode(path, input_shape):
+    # Runs inside a worker and returns uint8 pixels (4x smaller than float32 to
+    # hand back from a process); errors are reported per file instead of killing the run
+    try:
+        return path, preprocessing.decode_file(path, input_shape), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _produce(paths, executor, input_shape, batch_size, out_queue, stop):
+    # Decode batch N+1.. while the model is busy with batch N
+    decode = partial(_decode, input_shape=input_shape)
+    try:
+        for chunk in _chunks(paths, batch_size):
+            if stop.is_set():
+                break
+            out_queue.put(list(executor.map(decode, chunk)))
+    finally:
+        out_queue.put(_DONE)
+
+
+class ResultWriter:
+    def __init__(self, path):
+        self.path = path
+        self.format = "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+        self.fieldnames = ["path", "label", "confidence"] + [f"prob_{name}" for name in CLASS_NAMES] + ["error"]
+        self._file = open(path, "w", newline="") if path != "-" else sys.stdout
+        self._csv = None
+        if self.format == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=self.fieldnames)
+            self._csv.writeheader()
+
+    def write(self, row):
+        if self._csv is not None:
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(row) + "\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+def classify_paths(model, paths, writer, batch_size=64, workers=None, prefetch=2, use_processes=False, progress=True):
+    input_shape = tuple(model.input_shape)
+    preprocessor = preprocessing.get_preprocessor(input_shape)
+    workers = workers or os.cpu_count() or 1
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+
+    batches = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+    stats = {"images": 0, "errors": 0, "seconds": 0.0}
+    start = time.perf_counter()
+
+    with executor_cls(max_workers=workers) as executor:
+        producer = threading.Thread(
+            target=_produce,
+            args=(paths, executor, input_shape, batch_size, batches, stop),
+            daemon=True,
+        )
+        producer.start()
+        bar = tqdm(unit="img", disable=not progress, file=sys.stderr)
+        try:
+            while True:
+                batch = batches.get()
+                if batch is _DONE:
+                    break
+                ok = [(path, arr) for path, arr, err in batch if err is None]
+                for path, _, err in batch:
+                    if err is not None:
+                        writer.write({"path": path, "error": err})
+                        stats["errors"] += 1
+
+                if ok:
+                    # Normalised into a reused float32 buffer, overwritten by the next batch
+                    img_batch = preprocessor.normalize_batch([arr for _, arr in ok])
+                    predictions = model.predict(img_batch)
+                    for (path, _), prediction in zip(ok, predictions):
+                        predicted_label, confidence = classifier.label_prediction(prediction)
+                        row = {"path": path, "label": predicted_label, "confidence": round(confidence, 4)}
+                        for name, prob in zip(CLASS_NAMES, prediction):
+                            row[f"prob_{name}"] = round(float(prob), 6)
+                        writer.write(row)
+
+                writer.flush()
+                # Unreadable files are counted as errors, not towards throughput
+                stats["images"] += len(ok)
+                bar.update(len(batch))
+                elapsed = time.perf_counter() - start
+                bar.set_postfix(img_per_s=f"{stats['images'] / elapsed:.1f}")
+        finally:
+            stop.set()
+            bar.close()
+            # Drain so the producer is never stuck on a full queue
+            while producer.is_alive():
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["images_per_sec"] = stats["images"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify a directory or list of waste images without the UI.")
+    parser.add_argument("inputs", nargs="*", help="Image files and/or directories (walked recursively)")
+    parser.add_argument("--file-list", help="Text file with one image path per line")
+    parser.add_argument("--output", "-o", default="-", help="Output .csv or .jsonl file (default: CSV on stdout)")
+    parser.add_argument("--model", default=MODEL_PATH, help="Path to the Keras model")
+    parser.add_argument("--backend", choices=backends.BACKENDS, default=backends.BACKEND)
+    parser.add_argument("--tflite-model", default=backends.TFLITE_PATH, help="Path to the .tflite model")
+    parser.add_argument("--threads", type=int, default=backends.TFLITE_THREADS, help="TFLite interpreter threads")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None, help="Decode workers (default: CPU count)")
+    parser.add_argument("--prefetch", type=int, default=2, help="Decoded batches queued ahead of inference")
+    parser.add_argument("--processes", action="store_true", help="Decode in worker processes instead of threads")
+    parser.add_argument("--no-progress", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not args.inputs and not args.file_list:
+        parser.error("give at least one input path or --file-list")
+
+    model, error = backends.load_backend(args.backend, args.model, args.tflite_model, args.threads)
+    if error:
+        print(f"Error loading model: {error}", file=sys.stderr)
+        return 1
+
+    writer = ResultWriter(args.output)
+    try:
+        stats = classify_paths(
+            model,
+            iter_image_paths(args.inputs, args.file_list),
+            writer,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            prefetch=args.prefetch,
+            use_processes=args.processes,
+            progress=not args.no_progress,
+        )
+    finally:
+        writer.close()
+
+    print(
+        f"Classified {stats['images']} images ({stats['errors']} errors) in {stats['seconds']:.1f}s "
+        f"- {stats['images_per_sec']:.1f} images/sec",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""Per-stage performance benchmark of the classify pipeline used by app.py.
+
+Times decode, convert/resize, normalisation, predict, argmax/label mapping and
+the smart bins update payload across image resolutions and batch sizes. Runs
+offline: images are synthetic JPEGs, and a stand-in Keras model with the same
+input_shape is built when the Kaggle .h5 is not present.
+
+Examples:
+    python benchmark.py --output bench/current.json
+    python benchmark.py --baseline bench/baseline.json --max-regression 10
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+import backends
+import classifier
+import preprocessing
+from bins_view import bins_update, display_bins
+from classifier import MODEL_PATH
+
+STAGES = ["decode", "convert_resize", "normalize", "predict", "label", "render_bins"]
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def build_standin_model(input_shape, num_classes=2):
+    # Roughly the size/shape of a small image CNN, enough to exercise predict()
+    import tensorflow as tf
+
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=input_shape),
+        tf.keras.layers.Conv2D(32, 3, activation="relu"),
+        tf.keras.layers.MaxPooling2D(),
+        tf.keras.layers.Conv2D(64, 3, activation="relu"),
+        tf.keras.layers.MaxPooling2D(),
+        tf.keras.layers.Conv2D(128, 3, activation="relu"),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(64, activation="relu"),
+        tf.keras.layers.Dense(num_classes, activation="softmax"),
+    ])
+    return backends.KerasBackend(model)
+
+
+def load_benchmark_model(args):
+    if args.backend == "keras" and not os.path.exists(args.model):
+        shape = tuple(int(d) for d in args.input_shape.split(","))
+        print(f"{args.model} not found, using a stand-in model with input_shape {shape}", file=sys.stderr)
+        return build_standin_model(shape), "standin"
+    model, error = backends.load_backend(args.backend, args.model)
+    if error:
+        raise SystemExit(f"Error loading model: {error}")
+    return model, args.backend
+
+
+def synthetic_jpeg(width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x % 256, y % 256, ((x + y) // 2) % 256], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def summarize(samples_ms):
+    values = np.asarray(samples_ms)
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "mean_ms": float(values.mean()),
+    }
+
+
+def run_case(model, jpeg, batch_size, iterations, warmup):
+    preprocessor = preprocessing.get_preprocessor(tuple(model.input_shape))
+    width, height = preprocessor.width, preprocessor.height
+    timings = {stage: [] for stage in STAGES}
+    end_to_end = []
+    clock = time.perf_counter
+
+    for i in range(warmup + iterations):
+        record = i >= warmup
+        per_batch = {stage: 0.0 for stage in STAGES}
+        pixel_arrays = []
+        start = clock()
+        for _ in range(batch_size):
+            # Same steps as Preprocessor.decode, timed separately
+            t0 = clock()
+            img = Image.open(io.BytesIO(jpeg))
+            if preprocessor.draft:
+                img.draft(preprocessor.mode, (width, height))
+            img.load()
+            t1 = clock()
+            if img.mode != preprocessor.mode:
+                img = img.convert(preprocessor.mode)
+            img = img.resize((width, height), preprocessor.resample)
+            pixels = np.asarray(img, dtype=np.uint8)
+            if preprocessor.channels == 1:
+                pixels = pixels[..., np.newaxis]
+            pixel_arrays.append(pixels)
+            t2 = clock()
+            per_batch["decode"] += t1 - t0
+            per_batch["convert_resize"] += t2 - t1
+
+        t0 = clock()
+        batch = preprocessor.normalize_batch(pixel_arrays)
+        t1 = clock()
+        predictions = model.predict(batch)
+        t2 = clock()
+        labels = [classifier.label_prediction(p) for p in predictions]
+        t3 = clock()
+        # What the app sends per result: the bins page itself is static
+        json.dumps(bins_update(*labels[0]))
+        t4 = clock()
+        per_batch["normalize"] = t1 - t0
+        per_batch["predict"] = t2 - t1
+        per_batch["label"] = t3 - t2
+        per_batch["render_bins"] = t4 - t3
+        total = t4 - start
+
+        if record:
+            for stage in STAGES:
+                timings[stage].append(per_batch[stage] * 1000)
+            end_to_end.append(total * 1000)
+
+    result = {stage: summarize(timings[stage]) for stage in STAGES}
+    result["end_to_end"] = summarize(end_to_end)
+    result["images_per_sec"] = batch_size * len(end_to_end) / (sum(end_to_end) / 1000)
+    return result
+
+
+def compare(current, baseline, max_regression):
+    # Compares p50 per stage for every case present in both runs
+    regressions = []
+    for key, case in current["cases"].items():
+        base_case = baseline.get("cases", {}).get(key)
+        if base_case is None:
+            continue
+        for stage in STAGES + ["end_to_end"]:
+            now, before = case[stage]["p50_ms"], base_case[stage]["p50_ms"]
+            if before <= 0:
+                continue
+            change = (now - before) / before * 100
+            marker = ""
+            if change > max_regression:
+                marker = "  <-- regression"
+                regressions.append((key, stage, change))
+            print(f"{key:<22} {stage:<15} {before:9.3f} -> {now:9.3f} ms ({change:+6.1f}%){marker}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", choices=backends.BACKENDS, default=backends.BACKEND)
+    parser.add_argument("--input-shape", default="224,224,3", help="Stand-in model input shape when the .h5 is missing")
+    parser.add_argument("--resolutions", default="640x480,1280x720,1920x1080")
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Allowed p50 slowdown in percent")
+    args = parser.parse_args(argv)
+
+    model, model_kind = load_benchmark_model(args)
+    resolutions = [tuple(int(v) for v in r.split("x")) for r in args.resolutions.split(",")]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "pillow": Image.__version__,
+        },
+        "model": {"kind": model_kind, "input_shape": list(model.input_shape[1:])},
+        "preprocessing": {
+            "resize_filter": preprocessing.RESIZE_FILTER,
+            "jpeg_draft": preprocessing.JPEG_DRAFT,
+        },
+        "bins_payload_bytes": {
+            "full_html": len(display_bins("Organic", 97.5).encode()),
+            "update": len(json.dumps(bins_update("Organic", 97.5)).encode()),
+        },
+        "cases": {},
+    }
+
+    print(f"{'case':<22} {'stage':<15} {'p50':>9} {'p95':>9} {'p99':>9}  ms")
+    for width, height in resolutions:
+        jpeg = synthetic_jpeg(width, height)
+        for batch_size in batch_sizes:
+            key = f"{width}x{height}/batch{batch_size}"
+            case = run_case(model, jpeg, batch_size, args.iterations, args.warmup)
+            results["cases"][key] = case
+            for stage in STAGES + ["end_to_end"]:
+                s = case[stage]
+                print(f"{key:<22} {stage:<15} {s['p50_ms']:9.3f} {s['p95_ms']:9.3f} {s['p99_ms']:9.3f}")
+            print(f"{key:<22} {'throughput':<15} {case['images_per_sec']:9.1f} images/sec")
+
+    results["peak_rss_mb"] = peak_rss_mb()
+    if results["peak_rss_mb"] is not None:
+        print(f"Peak RSS: {results['peak_rss_mb']:.0f} MB")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"{len(regressions)} stage(s) slower than baseline by more than {args.max_regression}%", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from string import Template
+
+import metrics
+
+# SVG paths for the bin icons, shared by the bins view and the result card
+ORGANIC_ICON = (45, 47, [
+    ("M0 0 C0.51219785 12.13624352 0.69734757 22.60197737 -7.375 32.5 C-12.78392802 38.15163633 -18.29254889 39.82345471 -25.9375 40.1875 C-29.59055213 40.15284106 -32.59148587 39.36340565 -36 38 C-36.66 40.97 -37.32 43.94 -38 47 C-39.65 47 -41.3 47 -43 47 C-43.66416927 35.43853499 -40.90836798 27.25587167 -34 18 C-38.39291786 21.31909349 -40.8227865 23.79887886 -43 29 C-43.66 28.67 -44.32 28.34 -45 28 C-45.75567555 14.04099327 -45.75567555 14.04099327 -41 8 C-34.41916064 1.59234063 -27.00635857 1.65986319 -18.3125 1.4375 C-16.24597747 1.37758232 -14.17955836 1.3139496 -12.11328125 1.24609375 C-11.20360596 1.22216553 -10.29393066 1.1982373 -9.35668945 1.17358398 C-6.00131026 0.92644065 -3.46910202 0 0 0 Z ",
+     "translate(45,0)"),
+])
+RECYCLABLE_ICON = (60, 58, [
+    ("M0 0 C0.87471834 1.36201818 1.72397503 2.74040563 2.5625 4.125 C3.03816406 4.89070313 3.51382813 5.65640625 4.00390625 6.4453125 C5.31222282 9.8007597 4.96911995 11.54696449 4 15 C2.44140625 18.17578125 2.44140625 18.17578125 0.5625 21.3125 C-0.05496094 22.36050781 -0.67242187 23.40851562 -1.30859375 24.48828125 C-3 27 -3 27 -5 28 C-7.6723621 28.13415472 -10.32250488 28.04318541 -13 28 C-13 29.65 -13 31.3 -13 33 C-16.30979968 30.18667027 -18.1048141 26.858057 -20 23 C-19.61842486 19.75984496 -18.19622523 17.45573113 -16.4375 14.75 C-15.98246094 14.04359375 -15.52742188 13.3371875 -15.05859375 12.609375 C-14.53458984 11.81273437 -14.53458984 11.81273437 -14 11 C-13.67 12.32 -13.34 13.64 -13 15 C-11.35 15 -9.7 15 -8 15 C-8.66 13.906875 -9.32 12.81375 -10 11.6875 C-11.58464929 9.06292462 -12 8.1743622 -12 5 C-10.56705502 4.15885829 -9.12845595 3.32734313 -7.6875 2.5 C-6.88699219 2.0359375 -6.08648437 1.571875 -5.26171875 1.09375 C-3 0 -3 0 0 0 Z ",
+     "translate(51,23)"),
+    ("M0 0 C0.80759766 -0.03287109 1.61519531 -0.06574219 2.44726562 -0.09960938 C6.88873322 -0.1396226 8.64489187 0.01347967 12.26171875 2.83984375 C14.1875 5.4375 14.1875 5.4375 14.1875 7.4375 C15.8375 6.7775 17.4875 6.1175 19.1875 5.4375 C17.62108249 9.74514815 15.50413844 13.49921464 13.1875 17.4375 C8.5675 17.4375 3.9475 17.4375 -0.8125 17.4375 C0.1775 16.1175 1.1675 14.7975 2.1875 13.4375 C1.1975 12.4475 0.2075 11.4575 -0.8125 10.4375 C-1.080625 11.200625 -1.34875 11.96375 -1.625 12.75 C-2.8125 15.4375 -2.8125 15.4375 -5.8125 18.4375 C-9.1125 16.4575 -12.4125 14.4775 -15.8125 12.4375 C-13.42779746 2.89868985 -9.31065316 0.06592909 0 0 Z ",
+     "translate(28.8125,6.5625)"),
+    ("M0 0 C4.44892584 -0.53466319 8.57357974 -0.79287006 13 0 C15.92858724 2.574868 17.57268544 5.38935038 19 9 C19 9.66 19 10.32 19 11 C16.525 10.505 16.525 10.505 14 10 C13.67 11.32 13.34 12.64 13 14 C16.3 14 19.6 14 23 14 C23 18.29 23 22.58 23 27 C10.63862416 27.49445503 10.63862416 27.49445503 7.78515625 25.28515625 C0 15.31947484 0 15.31947484 0 9.125 C0.81960435 6.5637364 1.61892259 4.30179569 3 2 C2.01 1.67 1.02 1.34 0 1 C0 0.67 0 0.34 0 0 Z ",
+     "translate(5,24)"),
+])
+BIN_ICONS = {"Organic": ORGANIC_ICON, "Recyclable": RECYCLABLE_ICON}
+
+BINS_CSS = """
+    * {
+        margin: 0;
+        padding: 0;
+        box-sizing: border-box;
+    }
+    body {
+        padding: 20px;
+        background: transparent;
+        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+    }
+    .container {
+        display: flex;
+        justify-content: center;
+        align-items: flex-end;
+        gap: 60px;
+        max-width: 800px;
+        margin: 0 auto;
+    }
+    
+    .bin {
+        width: 200px;
+        position: relative;
+        transition: all 0.3s ease;
+    }
+    
+    .bin-wrapper {
+        position: relative;
+        height: 300px;
+    }
+    
+    .bin-body {
+        width: 100%;
+        height: 240px;
+        background: linear-gradient(145deg, #2a5c2a, #1a3d1a);
+        border-radius: 15px 15px 25px 25px;
+        position: absolute;
+        bottom: 0;
+        box-shadow: 0 15px 40px rgba(0,0,0,0.3);
+        transition: all 0.4s ease;
+        display: flex;
+        flex-direction: column;
+        align-items: center;
+        justify-content: center;
+        padding: 20px;
+    }
+    
+    .bin-body.recyclable {
+        background: linear-gradient(145deg, #2563eb, #1e40af);
+    }
+    
+    .bin-lid {
+        width: 100%;
+        height: 70px;
+        background: linear-gradient(145deg, #357535, #234d23);
+        border-radius: 15px 15px 8px 8px;
+        position: absolute;
+        top: 0;
+        transform-origin: top;
+        transition: transform 0.6s cubic-bezier(0.68, -0.55, 0.265, 1.55);
+        box-shadow: 0 8px 20px rgba(0,0,0,0.3);
+        z-index: 10;
+    }
+    
+    .bin-lid.recyclable {
+        background: linear-gradient(145deg, #3b82f6, #2563eb);
+    }
+    
+    .bin-lid::before {
+        content: '';
+        position: absolute;
+        width: 70px;
+        height: 18px;
+        background: linear-gradient(145deg, #2a2a2a, #1a1a1a);
+        top: 25px;
+        left: 50%;
+        transform: translateX(-50%);
+        border-radius: 8px;
+        box-shadow: inset 0 2px 4px rgba(0,0,0,0.5);
+    }
+    
+    .bin.active .bin-lid {
+        transform: rotateX(-130deg);
+    }
+    
+    .bin-label {
+        color: white;
+        font-size: 22px;
+        font-weight: 700;
+        text-transform: uppercase;
+        letter-spacing: 2px;
+        text-shadow: 2px 2px 4px rgba(0,0,0,0.5);
+        margin-top: 15px;
+    }
+    
+    .bin-icon {
+        width: 80px;
+        height: 80px;
+        filter: drop-shadow(3px 3px 6px rgba(0,0,0,0.3));
+    }
+    
+    @keyframes pulse {
+        0%, 100% { transform: scale(1); }
+        50% { transform: scale(1.1); }
+    }
+    
+    .bin.active {
+        animation: pulse 0.6s ease-in-out;
+    }
+    
+    .bin.active .bin-body {
+        box-shadow: 0 15px 50px rgba(34, 197, 94, 0.5);
+    }
+    
+    .bin.active .bin-body.recyclable {
+        box-shadow: 0 15px 50px rgba(37, 99, 235, 0.5);
+    }
+    
+    .bin-status {
+        position: absolute;
+        top: -40px;
+        width: 100%;
+        text-align: center;
+        font-size: 16px;
+        font-weight: 700;
+        color: #22c55e;
+        opacity: 0;
+        transition: opacity 0.3s ease;
+        text-shadow: 0 2px 4px rgba(0,0,0,0.2);
+    }
+    
+    .bin.active .bin-status {
+        opacity: 1;
+    }
+    
+    .confidence-badge {
+        position: absolute;
+        bottom: -35px;
+        left: 50%;
+        transform: translateX(-50%);
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        color: white;
+        padding: 8px 20px;
+        border-radius: 20px;
+        font-size: 14px;
+        font-weight: 600;
+        box-shadow: 0 4px 12px rgba(0,0,0,0.2);
+        opacity: 0;
+        transition: opacity 0.3s ease;
+    }
+    
+    .bin.active .confidence-badge {
+        opacity: 1;
+    }
+
+"""
+
+CHECK_ICON = (
+    '<svg width="20" height="20" viewBox="0 0 24 24" fill="#22c55e" style="vertical-align: middle; margin-right: 4px;">'
+    '<path d="M21,7L9,19L3.5,13.5L4.91,12.09L9,16.17L19.59,5.59L21,7Z"/></svg>'
+)
+
+BINS = (("Organic", ""), ("Recyclable", " recyclable"))
+
+
+def icon_svg(label, fill):
+    width, height, paths = BIN_ICONS[label]
+    path_markup = "".join(f'<path d="{d}" fill="{fill}" transform="{transform}"/>' for d, transform in paths)
+    return (
+        f'<svg class="bin-icon" version="1.1" xmlns="http://www.w3.org/2000/svg" '
+        f'width="{width}" height="{height}" viewBox="0 0 {width} {height}">{path_markup}</svg>'
+    )
+
+
+def _bin_markup(label, extra_class, badge):
+    # $active_<label> is filled in later with string.Template
+    return f"""
+        <div class="bin $active_{label}" id="bin-{label}">
+            <div class="bin-status">
+                {CHECK_ICON}
+                BIN OPENED
+            </div>
+            <div class="bin-wrapper">
+                <div class="bin-lid{extra_class}"></div>
+                <div class="bin-body{extra_class}">
+                    {icon_svg(label, "#FFFFFF")}
+                    <div class="bin-label">{label}</div>
+                </div>
+            </div>
+            {badge}
+        </div>"""
+
+
+def _document(bins, script=""):
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<style>{BINS_CSS}</style>
+</head>
+<body>
+    <div class="container">{bins}
+    </div>{script}
+</body>
+</html>
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def _display_template():
+    # Static markup is built once; display_bins() only fills in the active bin and badge
+    return Template(_document("".join(_bin_markup(label, extra, f"$badge_{label}") for label, extra in BINS)))
+
+
+# Function to display bins with Updated SVGs
+def display_bins(predicted_class, confidence):
+    # Full self-contained document (components.html, benchmarks, anything outside the component)
+    badge = f"<div class='confidence-badge'>Confidence: {confidence:.1f}%</div>"
+    return _display_template().substitute(
+        active_Organic="active" if predicted_class == "Organic" else "",
+        active_Recyclable="active" if predicted_class == "Recyclable" else "",
+        badge_Organic=badge if predicted_class == "Organic" else "",
+        badge_Recyclable=badge if predicted_class == "Recyclable" else "",
+    )
+
+
+# Minimal Streamlit component protocol, hand-rolled so no frontend build is
+# needed: the page is loaded once and every rerun only posts the new args.
+_COMPONENT_SCRIPT = """
+    <script>
+        function send(type, data) {
+            window.parent.postMessage(Object.assign({isStreamlitMessage: true, type: type}, data), "*");
+        }
+        var current = null;
+        window.addEventListener("message", function (event) {
+            if (!event.data || event.data.type !== "streamlit:render") return;
+            var args = event.data.args || {};
+            var state = args.active + "|" + args.confidence;
+            if (state === current) return;
+            current = state;
+            document.querySelectorAll(".bin").forEach(function (bin) {
+                bin.classList.remove("active");
+                if (bin.id === "bin-" + args.active) {
+                    bin.querySelector(".confidence-value").textContent = Number(args.confidence).toFixed(1);
+                    void bin.offsetWidth;  // restart the pulse animation
+                    bin.classList.add("active");
+                }
+            });
+        });
+        send("streamlit:componentReady", {apiVersion: 1});
+        send("streamlit:setFrameHeight", {height: 400});
+    </script>"""
+
+
+@functools.lru_cache(maxsize=None)
+def static_bins_html():
+    badge = "<div class='confidence-badge'>Confidence: <span class='confidence-value'></span>%</div>"
+    bins = "".join(_bin_markup(label, extra, badge) for label, extra in BINS)
+    return Template(_document(bins, _COMPONENT_SCRIPT)).substitute(active_Organic="", active_Recyclable="")
+
+
+@functools.lru_cache(maxsize=None)
+def _bins_component():
+    # declare_component serves a directory, so the static page is written once per content hash
+    import streamlit.components.v1 as components
+
+    html = static_bins_html()
+    directory = os.path.join(tempfile.gettempdir(), "airwaste-bins-" + hashlib.sha1(html.encode()).hexdigest()[:12])
+    index = os.path.join(directory, "index.html")
+    if not os.path.exists(index):
+        os.makedirs(directory, exist_ok=True)
+        with open(index, "w") as f:
+            f.write(html)
+    return components.declare_component("smart_bins", path=directory)
+
+
+def bins_update(predicted_class, confidence):
+    return {"active": predicted_class or "", "confidence": round(float(confidence), 1)}
+
+
+def render_bins(predicted_class, confidence, key="smart_bins"):
+    # Same key on every rerun, so Streamlit keeps the iframe and only sends the args
+    args = bins_update(predicted_class, confidence)
+    metrics.inc("bins_updates_total")
+    metrics.inc("bins_update_bytes_total", len(json.dumps(args)))
+    return _bins_component()(**args, key=key, default=None)
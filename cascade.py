@@ -0,0 +1,199 @@
+"""Confidence cascade: a cheap model classifies every frame, the full CNN only
+the frames it is unsure about.
+
+The fast tier is any backend, by default the int8 TFLite model written by
+convert_tflite.py; a lower-resolution model works too, its batch is resized
+to fit. Frames whose fast top probability is below the threshold are sent to
+the full model. A small random share of confident frames is also checked
+against the full model to measure how often the cascade disagrees with it.
+
+    AIRWASTE_CASCADE=1 AIRWASTE_CASCADE_MODEL=model-int8.tflite streamlit run app.py
+    python cascade.py --images dataset/TEST --thresholds 0.6,0.8,0.9,0.95   # pick a threshold
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import backends
+import metrics
+from classifier import MODEL_PATH
+
+CASCADE_ENABLED = os.environ.get("AIRWASTE_CASCADE", "0") == "1"
+CASCADE_BACKEND = os.environ.get("AIRWASTE_CASCADE_BACKEND", "tflite")
+CASCADE_MODEL = os.environ.get("AIRWASTE_CASCADE_MODEL", os.path.splitext(MODEL_PATH)[0] + "-int8.tflite")
+# Fast-tier top probability (0-1) needed to skip the full model
+CASCADE_THRESHOLD = float(os.environ.get("AIRWASTE_CASCADE_THRESHOLD", "0.9"))
+# Share of confident frames also run through the full model for the agreement rate
+CASCADE_AUDIT_RATE = float(os.environ.get("AIRWASTE_CASCADE_AUDIT", "0.02"))
+
+
+def load_fast_model(kind=CASCADE_BACKEND, path=CASCADE_MODEL):
+    if kind == "tflite":
+        return backends.load_backend(kind, tflite_path=path)
+    if kind == "savedmodel":
+        return backends.load_backend(kind, savedmodel_path=path)
+    return backends.load_backend(kind, path)
+
+
+def fit_batch(batch, input_shape):
+    # Resize a batch preprocessed for one model to another model's input size
+    height, width, channels = input_shape[1:]
+    if batch.shape[1:3] != (height, width):
+        batch = np.stack([cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA) for img in batch])
+        if batch.ndim == 3:
+            batch = batch[..., np.newaxis]
+    if batch.shape[-1] != channels:
+        batch = batch.mean(axis=-1, keepdims=True) if channels == 1 else np.repeat(batch, channels, axis=-1)
+    return np.ascontiguousarray(batch, dtype=np.float32)
+
+
+class CascadeModel:
+    # Same predict(batch) / input_shape / name surface as the backends. The
+    # input is preprocessed for the full model.
+
+    def __init__(self, fast, full, threshold=CASCADE_THRESHOLD, audit_rate=CASCADE_AUDIT_RATE, seed=None):
+        self.fast = fast
+        self.full = full
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.input_shape = full.input_shape
+        self.name = f"cascade {fast.name} -> {full.name}"
+        self.concurrency = getattr(full, "concurrency", 1)
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.fast_hits = 0
+        self.escalations = 0
+        self.escalations_agreed = 0
+        self.audits = 0
+        self.audits_agreed = 0
+        self.fast_ms = 0.0
+        self.full_ms = 0.0
+        self.full_images = 0
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        start = time.perf_counter()
+        fast_predictions = np.asarray(self.fast.predict(fit_batch(batch, self.fast.input_shape)), dtype=np.float32)
+        fast_ms = (time.perf_counter() - start) * 1000
+        metrics.observe("cascade_fast", fast_ms)
+
+        confident = fast_predictions.max(axis=1) >= self.threshold
+        with self._lock:
+            audit = confident & (self._rng.random(len(batch)) < self.audit_rate)
+        escalate = ~confident | audit
+        predictions = fast_predictions.copy()
+        full_ms = 0.0
+        agreed = np.zeros(len(batch), dtype=bool)
+        if escalate.any():
+            start = time.perf_counter()
+            full_predictions = np.asarray(self.full.predict(batch[escalate]), dtype=np.float32)
+            full_ms = (time.perf_counter() - start) * 1000
+            metrics.observe("cascade_full", full_ms)
+            agreed[escalate] = full_predictions.argmax(axis=1) == fast_predictions[escalate].argmax(axis=1)
+            # Audited frames keep the fast answer, as they would without the audit
+            predictions[~confident] = full_predictions[~confident[escalate]]
+
+        with self._lock:
+            self.requests += len(batch)
+            self.fast_hits += int(confident.sum())
+            self.escalations += int((~confident).sum())
+            self.escalations_agreed += int((agreed & ~confident).sum())
+            self.audits += int(audit.sum())
+            self.audits_agreed += int((agreed & audit).sum())
+            self.fast_ms += fast_ms
+            self.full_ms += full_ms
+            self.full_images += int(escalate.sum())
+        metrics.inc("cascade_tier_total", int(confident.sum()), label="fast")
+        metrics.inc("cascade_tier_total", int((~confident).sum()), label="full")
+        return predictions
+
+    def stats(self):
+        with self._lock:
+            full_per_image = self.full_ms / self.full_images if self.full_images else 0.0
+            # What every frame going to the full model would have cost, minus what the cascade spent
+            saved_ms = self.requests * full_per_image - self.fast_ms - self.full_ms if self.full_images else 0.0
+            stats = {
+                "cascade_requests": self.requests,
+                "cascade_fast_hits": self.fast_hits,
+                "cascade_escalations": self.escalations,
+                "cascade_fast_hit_rate": self.fast_hits / self.requests if self.requests else 0.0,
+                "cascade_audits": self.audits,
+                "cascade_agreement_rate": self.audits_agreed / self.audits if self.audits else 0.0,
+                "cascade_escalation_agreement_rate": (
+                    self.escalations_agreed / self.escalations if self.escalations else 0.0),
+                "cascade_fast_ms_per_image": self.fast_ms / self.requests if self.requests else 0.0,
+                "cascade_full_ms_per_image": full_per_image,
+                "cascade_latency_saved_ms": saved_ms,
+            }
+        if hasattr(self.full, "stats"):
+            stats.update(self.full.stats())
+        return stats
+
+
+def load_cascade(full, kind=CASCADE_BACKEND, path=CASCADE_MODEL, threshold=CASCADE_THRESHOLD):
+    fast, error = load_fast_model(kind, path)
+    if error:
+        return None, f"cascade fast model: {error}"
+    return CascadeModel(fast, full, threshold), None
+
+
+def _timed_predict(model, images, batch_size):
+    outputs = []
+    model.predict(images[:1])  # warm-up
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        outputs.append(np.asarray(model.predict(images[i:i + batch_size]), dtype=np.float32))
+    return np.concatenate(outputs), (time.perf_counter() - start) * 1000 / len(images)
+
+
+def main(argv=None):
+    import convert_tflite
+
+    parser = argparse.ArgumentParser(description="Fast-tier hit rate, agreement and cost per cascade threshold.")
+    parser.add_argument("--images", help="Folder of sample images (default: synthetic samples)")
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", choices=backends.BACKENDS, default="keras", help="Full model backend")
+    parser.add_argument("--fast-backend", choices=backends.BACKENDS, default=CASCADE_BACKEND)
+    parser.add_argument("--fast-model", default=CASCADE_MODEL)
+    parser.add_argument("--thresholds", default="0.6,0.7,0.8,0.9,0.95,0.99")
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    full, error = backends.load_backend(args.backend, args.model)
+    if error:
+        print(f"Error loading model: {error}", file=sys.stderr)
+        return 1
+    fast, error = load_fast_model(args.fast_backend, args.fast_model)
+    if error:
+        print(f"Error loading fast model: {error}", file=sys.stderr)
+        return 1
+
+    images = convert_tflite.sample_images(full.input_shape, args.images, args.count)
+    full_predictions, full_ms = _timed_predict(full, images, args.batch_size)
+    fast_predictions, fast_ms = _timed_predict(fast, fit_batch(images, fast.input_shape), args.batch_size)
+    agree = fast_predictions.argmax(axis=1) == full_predictions.argmax(axis=1)
+    top = fast_predictions.max(axis=1)
+    print(f"{len(images)} images · full {full_ms:.2f} ms/image · fast {fast_ms:.2f} ms/image · "
+          f"overall label agreement {agree.mean() * 100:.1f}%")
+    print(f"{'threshold':>9} {'fast hits':>9} {'agree@fast':>10} {'cascade=full':>12} {'ms/image':>9} {'speedup':>8}")
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        confident = top >= threshold
+        hit_rate = confident.mean()
+        # Escalated frames take the full model's answer, so only fast hits can disagree
+        cascade_agreement = (agree | ~confident).mean()
+        cost = fast_ms + (1 - hit_rate) * full_ms
+        print(f"{threshold:>9.2f} {hit_rate * 100:>8.1f}% "
+              f"{agree[confident].mean() * 100 if confident.any() else 100:>9.1f}% "
+              f"{cascade_agreement * 100:>11.1f}% {cost:>9.2f} {full_ms / cost:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
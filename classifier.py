@@ -0,0 +1,48 @@
+import numpy as np
+
+# Load model
+# NOTE: Ensure this path matches your folder structure exactly
+MODEL_PATH = "waste-classification-cnn-model-tensorflow1-default-v1/Waste-Classification-CNN-Model.h5"
+
+CLASS_NAMES = ["Organic", "Recyclable"]
+
+
+def load_model(path=MODEL_PATH):
+    # TensorFlow is imported here so preprocessing-only users don't pay for it
+    import tensorflow as tf
+
+    try:
+        model = tf.keras.models.load_model(path)
+        return model, None
+    except Exception as e:
+        return None, str(e)
+
+
+def preprocess_image(img, input_shape):
+    # Get model input shape
+    input_h, input_w, input_c = input_shape[1], input_shape[2], input_shape[3]
+
+    # Convert based on channels
+    if input_c == 1:
+        img = img.convert("L")
+    else:
+        img = img.convert("RGB")
+
+    # Resize
+    img_resized = img.resize((input_w, input_h))
+
+    # Array conversion
+    img_array = np.array(img_resized) / 255.0
+
+    # Add channel if grayscale
+    if input_c == 1:
+        img_array = np.expand_dims(img_array, axis=-1)
+
+    return img_array
+
+
+def label_prediction(prediction):
+    predicted_idx = int(np.argmax(prediction))
+    predicted_label = CLASS_NAMES[predicted_idx]
+    confidence = float(prediction[predicted_idx] * 100)
+    return predicted_label, confidence
@@ -0,0 +1,122 @@
+"""Convert the Keras .h5 classifier to TFLite and check parity with the Keras path.
+
+Examples:
+    python convert_tflite.py --quantize float16
+    python convert_tflite.py --quantize int8 --calibration-dir dataset/TRAIN --output model-int8.tflite
+    python convert_tflite.py --check-only --output model-int8.tflite --calibration-dir dataset/TEST
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+import classifier
+import preprocessing
+from backends import KerasBackend, TFLiteBackend, TFLITE_PATH
+from batch_classify import iter_image_paths
+from classifier import MODEL_PATH
+
+
+def sample_images(input_shape, image_dir=None, count=100, seed=0):
+    # Real images when available, otherwise deterministic noise of the right shape
+    if image_dir:
+        paths = list(iter_image_paths([image_dir]))
+        rng = np.random.default_rng(seed)
+        rng.shuffle(paths)
+        preprocessor = preprocessing.get_preprocessor(tuple(input_shape))
+        images = [preprocessor(p) for p in paths[:count]]
+        if images:
+            return np.stack(images)
+        print(f"No images found in {image_dir}, falling back to synthetic samples", file=sys.stderr)
+    rng = np.random.default_rng(seed)
+    return rng.random((count, *input_shape[1:]), dtype=np.float32)
+
+
+def convert(model, quantize="none", calibration=None):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([img[np.newaxis]] for img in calibration)
+        # Int8 kernels inside, float32 in/out so callers don't change
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.TFLITE_BUILTINS_INT8,
+            tf.lite.OpsSet.TFLITE_BUILTINS,
+        ]
+    return converter.convert()
+
+
+def _time_per_image(backend, images, repeats=3):
+    backend.predict(images[:1])  # warm-up
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for img in images:
+            backend.predict(img[np.newaxis])
+        best = min(best, time.perf_counter() - start)
+    return best / len(images) * 1000
+
+
+def check_parity(reference, candidate, images):
+    ref = reference.predict(images)
+    out = candidate.predict(images)
+    return {
+        "samples": len(images),
+        "max_abs_diff": float(np.max(np.abs(ref - out))),
+        "mean_abs_diff": float(np.mean(np.abs(ref - out))),
+        "label_agreement": float(np.mean(np.argmax(ref, axis=1) == np.argmax(out, axis=1))),
+        "reference_ms": _time_per_image(reference, images),
+        "candidate_ms": _time_per_image(candidate, images),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=MODEL_PATH, help="Keras .h5 model to convert")
+    parser.add_argument("--output", default=TFLITE_PATH, help="Where to write the .tflite file")
+    parser.add_argument("--quantize", choices=["none", "float16", "int8"], default="none")
+    parser.add_argument("--calibration-dir", help="Image folder for int8 calibration and the parity check")
+    parser.add_argument("--samples", type=int, default=100, help="Calibration / parity sample count")
+    parser.add_argument("--threads", type=int, default=None, help="TFLite interpreter threads for the parity check")
+    parser.add_argument("--check-only", action="store_true", help="Skip conversion, only compare --output against --model")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="Max allowed probability difference")
+    args = parser.parse_args(argv)
+
+    model, error = classifier.load_model(args.model)
+    if error:
+        print(f"Error loading model: {error}", file=sys.stderr)
+        return 1
+
+    images = sample_images(model.input_shape, args.calibration_dir, args.samples)
+
+    if not args.check_only:
+        if args.quantize == "int8" and not args.calibration_dir:
+            print("Warning: int8 calibration on synthetic images, pass --calibration-dir for real accuracy", file=sys.stderr)
+        tflite_model = convert(model, args.quantize, images)
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "wb") as f:
+            f.write(tflite_model)
+        h5_mb = os.path.getsize(args.model) / 1e6
+        print(f"Wrote {args.output} ({len(tflite_model) / 1e6:.1f} MB, .h5 was {h5_mb:.1f} MB)")
+
+    report = check_parity(KerasBackend(model), TFLiteBackend(args.output, args.threads), images)
+    print(
+        f"Parity over {report['samples']} images: max |diff| {report['max_abs_diff']:.4f}, "
+        f"mean |diff| {report['mean_abs_diff']:.4f}, label agreement {report['label_agreement'] * 100:.1f}%"
+    )
+    print(f"Latency per image: keras {report['reference_ms']:.2f} ms, tflite {report['candidate_ms']:.2f} ms")
+
+    if report["max_abs_diff"] > args.tolerance:
+        print(f"FAILED: difference above tolerance {args.tolerance}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""Offline evaluation on the Kaggle dataset with a preprocessed tensor cache.
+
+The first run decodes and resizes every image of the split (e.g. dataset/TEST
+with O/ and R/ folders) once into uint8 .npy shards. Later runs memory-map
+the shards and only normalise and predict. The cache key covers the model
+input_shape, the preprocessing settings and every file's path, size and
+mtime, so adding/replacing images or changing preprocessing rebuilds it.
+
+    python evaluate.py dataset/TEST
+    python evaluate.py dataset/TEST --backend tflite --output bench/eval-tflite.json
+    AIRWASTE_RESIZE_FILTER=bilinear python evaluate.py dataset/TEST   # builds a second cache
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from tqdm import tqdm
+
+import backends
+import preprocessing
+from batch_classify import IMAGE_EXTENSIONS
+from classifier import CLASS_NAMES, MODEL_PATH
+
+CACHE_DIR = os.environ.get("AIRWASTE_EVAL_CACHE", ".eval_cache")
+SHARD_ROWS = int(os.environ.get("AIRWASTE_EVAL_SHARD_ROWS", "4096"))
+CACHE_VERSION = 1  # bump when the cache layout or decode logic changes
+
+
+def class_index(folder):
+    # Kaggle folders are "O" / "R"; full class names work too
+    name = folder.lower()
+    for index, class_name in enumerate(CLASS_NAMES):
+        if class_name.lower() == name or class_name.lower().startswith(name):
+            return index
+    return None
+
+
+def list_dataset(root):
+    # -> sorted [(relative path, class index, size, mtime_ns)]
+    entries = []
+    for folder in sorted(os.listdir(root)):
+        label = class_index(folder)
+        if label is None or not os.path.isdir(os.path.join(root, folder)):
+            continue
+        for dirpath, dirs, files in os.walk(os.path.join(root, folder)):
+            dirs.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    path = os.path.join(dirpath, name)
+                    stat = os.stat(path)
+                    entries.append((os.path.relpath(path, root), label, stat.st_size, stat.st_mtime_ns))
+    return entries
+
+
+def cache_variant(root, input_shape, resize_filter, draft):
+    # Identifies the dataset root and preprocessing settings; caches only
+    # replace older caches of the same variant
+    settings = {"root": os.path.abspath(root), "input_shape": list(input_shape[1:]),
+                "resize_filter": resize_filter, "draft": draft}
+    return hashlib.sha1(json.dumps(settings).encode()).hexdigest()[:8]
+
+
+def cache_key(entries, input_shape, resize_filter, draft):
+    digest = hashlib.sha1()
+    digest.update(json.dumps({
+        "version": CACHE_VERSION,
+        "input_shape": list(input_shape[1:]),
+        "resize_filter": resize_filter,
+        "draft": draft,
+        "classes": CLASS_NAMES,
+    }).encode())
+    for entry in entries:
+        digest.update(json.dumps(entry).encode())
+    return digest.hexdigest()[:16]
+
+
+class DatasetCache:
+    # uint8 shards of shape (rows, H, W, C) plus labels, under
+    # <cache_dir>/<split>-<H>x<W>x<C>-<variant>-<key>/. manifest.json is written last,
+    # so a directory without one is an interrupted build and is rebuilt.
+
+    def __init__(self, root, input_shape, cache_dir=CACHE_DIR, resize_filter=preprocessing.RESIZE_FILTER,
+                 draft=preprocessing.JPEG_DRAFT, shard_rows=SHARD_ROWS):
+        self.root = root
+        self.input_shape = tuple(input_shape)
+        self.preprocessor = preprocessing.get_preprocessor(self.input_shape, resize_filter, draft)
+        self.shard_rows = shard_rows
+        self.entries = list_dataset(root)
+        split = os.path.basename(os.path.normpath(os.path.abspath(root)))
+        shape = "x".join(str(d) for d in self.input_shape[1:])
+        variant = cache_variant(root, self.input_shape, resize_filter, draft)
+        self.prefix = os.path.join(cache_dir, f"{split}-{shape}-{variant}-")
+        self.key = cache_key(self.entries, self.input_shape, resize_filter, draft)
+        self.path = self.prefix + self.key
+        self.manifest = None
+
+    @property
+    def fresh(self):
+        return os.path.exists(os.path.join(self.path, "manifest.json"))
+
+    def _prune(self):
+        # Older caches of the same root and preprocessing settings are stale
+        # by definition; other roots and settings keep their own cache
+        parent = os.path.dirname(self.prefix) or "."
+        for name in os.listdir(parent):
+            path = os.path.join(parent, name)
+            if path.startswith(self.prefix) and path != self.path:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def build(self, workers=None, progress=True):
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.makedirs(self.path)
+        height, width, channels = self.preprocessor.height, self.preprocessor.width, self.preprocessor.channels
+        decode = lambda entry: _decode(self.preprocessor, os.path.join(self.root, entry[0]))
+        labels, paths, skipped, shards = [], [], [], []
+        shard, row = None, 0
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            for entry, pixels in tqdm(zip(self.entries, executor.map(decode, self.entries)), total=len(self.entries),
+                                      unit="img", desc="Building cache", disable=not progress, file=sys.stderr):
+                if pixels is None:
+                    skipped.append(entry[0])
+                    continue
+                if shard is None or row == self.shard_rows:
+                    if shard is not None:
+                        shard.flush()
+                    # Sized for what is left; rows lost to unreadable files stay unused
+                    rows = min(self.shard_rows, len(self.entries) - len(labels) - len(skipped))
+                    name = f"shard-{len(shards):05d}.npy"
+                    shard = np.lib.format.open_memmap(os.path.join(self.path, name), mode="w+", dtype=np.uint8,
+                                                      shape=(rows, height, width, channels))
+                    shards.append({"file": name, "rows": 0})
+                    row = 0
+                shard[row] = pixels
+                row += 1
+                shards[-1]["rows"] = row
+                labels.append(entry[1])
+                paths.append(entry[0])
+        if shard is not None:
+            shard.flush()
+            del shard
+        np.save(os.path.join(self.path, "labels.npy"), np.asarray(labels, dtype=np.uint8))
+        manifest = {"key": self.key, "root": os.path.abspath(self.root), "input_shape": list(self.input_shape[1:]),
+                    "resize_filter": self.preprocessor.resize_filter, "draft": self.preprocessor.draft,
+                    "images": len(labels), "shards": shards, "paths": paths, "skipped": skipped}
+        with open(os.path.join(self.path, "manifest.json.tmp"), "w") as f:
+            json.dump(manifest, f)
+        os.replace(os.path.join(self.path, "manifest.json.tmp"), os.path.join(self.path, "manifest.json"))
+        self._prune()
+        self.manifest = manifest
+        return manifest
+
+    def load(self):
+        with open(os.path.join(self.path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        return self.manifest
+
+    def open(self, workers=None, progress=True):
+        # -> (built now?, seconds)
+        start = time.perf_counter()
+        built = not self.fresh
+        if built:
+            self.build(workers, progress)
+        else:
+            self.load()
+        return built, time.perf_counter() - start
+
+    @property
+    def labels(self):
+        return np.load(os.path.join(self.path, "labels.npy"))
+
+    def iter_batches(self, batch_size):
+        # Yields uint8 views of the memory-mapped shards; a batch never spans shards
+        for shard in self.manifest["shards"]:
+            pixels = np.load(os.path.join(self.path, shard["file"]), mmap_mode="r")[:shard["rows"]]
+            for offset in range(0, len(pixels), batch_size):
+                yield pixels[offset:offset + batch_size]
+
+
+def _decode(preprocessor, path):
+    try:
+        return preprocessor.decode(path)
+    except Exception:
+        return None
+
+
+def classification_report(labels, predicted, num_classes=len(CLASS_NAMES)):
+    confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+    np.add.at(confusion, (labels, predicted), 1)
+    per_class = {}
+    for index, name in enumerate(CLASS_NAMES[:num_classes]):
+        true_positive = confusion[index, index]
+        predicted_total = confusion[:, index].sum()
+        actual_total = confusion[index, :].sum()
+        precision = true_positive / predicted_total if predicted_total else 0.0
+        recall = true_positive / actual_total if actual_total else 0.0
+        per_class[name] = {
+            "precision": float(precision),
+            "recall": float(recall),
+            "f1": float(2 * precision * recall / (precision + recall)) if precision + recall else 0.0,
+            "support": int(actual_total),
+        }
+    return {
+        "accuracy": float(np.trace(confusion) / confusion.sum()) if confusion.sum() else 0.0,
+        "per_class": per_class,
+        "confusion_matrix": confusion.tolist(),
+    }
+
+
+def evaluate(model, cache, batch_size=64, progress=True):
+    predicted = []
+    bar = tqdm(total=cache.manifest["images"], unit="img", desc="Evaluating", disable=not progress, file=sys.stderr)
+    start = time.perf_counter()
+    predict_seconds = 0.0
+    for pixels in cache.iter_batches(batch_size):
+        batch = cache.preprocessor.normalize_batch(pixels)
+        predict_start = time.perf_counter()
+        predictions = model.predict(batch)
+        predict_seconds += time.perf_counter() - predict_start
+        predicted.append(np.argmax(predictions, axis=1))
+        bar.update(len(pixels))
+    bar.close()
+    seconds = time.perf_counter() - start
+    predicted = np.concatenate(predicted) if predicted else np.zeros(0, dtype=np.int64)
+    report = classification_report(cache.labels.astype(np.int64), predicted)
+    report["images"] = int(len(predicted))
+    report["seconds"] = seconds
+    report["images_per_sec"] = len(predicted) / seconds if seconds else 0.0
+    report["predict_images_per_sec"] = len(predicted) / predict_seconds if predict_seconds else 0.0
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a model on a dataset split through a preprocessed cache.")
+    parser.add_argument("split", help="Dataset split folder with one subfolder per class (O/, R/)")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", choices=backends.BACKENDS, default=backends.BACKEND)
+    parser.add_argument("--tflite-model", default=backends.TFLITE_PATH)
+    parser.add_argument("--input-shape", help="H,W,C to build the cache without loading a model (with --build-only)")
+    parser.add_argument("--build-only", action="store_true", help="Only build/refresh the cache")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the cache even if it is fresh")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None, help="Decode threads when building the cache")
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--no-progress", action="store_true")
+    args = parser.parse_args(argv)
+
+    model = None
+    if args.input_shape and args.build_only:
+        input_shape = (None, *(int(d) for d in args.input_shape.split(",")))
+    else:
+        model, error = backends.load_backend(args.backend, args.model, args.tflite_model)
+        if error:
+            print(f"Error loading model: {error}", file=sys.stderr)
+            return 1
+        input_shape = model.input_shape
+
+    cache = DatasetCache(args.split, input_shape, args.cache_dir)
+    if not cache.entries:
+        print(f"No images in class folders under {args.split}", file=sys.stderr)
+        return 1
+    if args.rebuild and os.path.exists(cache.path):
+        shutil.rmtree(cache.path)
+    built, cache_seconds = cache.open(args.workers, progress=not args.no_progress)
+    skipped = len(cache.manifest["skipped"])
+    print(f"{'Built' if built else 'Reused'} cache {cache.path} ({cache.manifest['images']} images"
+          f"{f', {skipped} unreadable skipped' if skipped else ''}) in {cache_seconds:.1f}s", file=sys.stderr)
+    if model is None:
+        return 0
+
+    report = evaluate(model, cache, args.batch_size, progress=not args.no_progress)
+    report.update(model=model.name, split=os.path.abspath(args.split), cache=cache.path,
+                  cache_built=built, cache_seconds=cache_seconds)
+    print(f"Accuracy {report['accuracy'] * 100:.2f}% on {report['images']} images")
+    print(f"{'class':<12} {'precision':>9} {'recall':>9} {'f1':>9} {'support':>8}")
+    for name, row in report["per_class"].items():
+        print(f"{name:<12} {row['precision']:>9.3f} {row['recall']:>9.3f} {row['f1']:>9.3f} {row['support']:>8}")
+    print("Confusion matrix (rows = actual, columns = predicted):")
+    print(f"{'':<12}" + "".join(f"{name:>12}" for name in CLASS_NAMES))
+    for name, row in zip(CLASS_NAMES, report["confusion_matrix"]):
+        print(f"{name:<12}" + "".join(f"{count:>12}" for count in row))
+    print(f"Throughput {report['images_per_sec']:.1f} images/sec end to end, "
+          f"{report['predict_images_per_sec']:.1f} images/sec in predict")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
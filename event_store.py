@@ -0,0 +1,373 @@
+"""Append-only on-disk log of classification events, with aggregate queries.
+
+Each event is one fixed-size numpy record (timestamp, bin id, source, class
+probabilities, stage latencies). Records are buffered in memory and appended
+to raw segment files in batches; a segment rolls over after SEGMENT_ROWS
+records. Queries memory-map the segments and aggregate them chunk by chunk,
+so months of events never have to fit in RAM.
+
+    python event_store.py --since 2024-06-01          # per-bin summary
+    python event_store.py --generate 5000000          # synthetic data for load testing
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from classifier import CLASS_NAMES
+
+ENABLED = os.environ.get("AIRWASTE_EVENTS", "1") != "0"
+EVENTS_DIR = os.environ.get("AIRWASTE_EVENTS_DIR", "events")
+# Which physical bin this process classifies for; defaults to the edge box hostname
+BIN_ID = os.environ.get("AIRWASTE_BIN_ID", socket.gethostname())[:16]
+SEGMENT_ROWS = int(os.environ.get("AIRWASTE_EVENTS_SEGMENT_ROWS", "1000000"))
+FLUSH_ROWS = int(os.environ.get("AIRWASTE_EVENTS_FLUSH_ROWS", "256"))
+FLUSH_SECONDS = float(os.environ.get("AIRWASTE_EVENTS_FLUSH_SECONDS", "5"))
+CHUNK_ROWS = 1 << 20  # rows aggregated at a time by the queries
+
+SOURCES = ("snapshot", "stream")
+STAGES = ("preprocess_ms", "predict_ms", "total_ms")
+# Index of the class that counts as diverted from landfill
+RECYCLABLE = CLASS_NAMES.index("Recyclable")
+
+
+def event_dtype(num_classes=len(CLASS_NAMES)):
+    # 50 bytes per event with two classes; unaligned on purpose, memmap does not care
+    return np.dtype([
+        ("ts", "<f8"),
+        ("bin_id", "S16"),
+        ("source", "u1"),
+        ("label", "u1"),
+        ("confidence", "<f4"),
+        ("probs", "<f4", (num_classes,)),
+        *[(stage, "<f4") for stage in STAGES],
+    ])
+
+
+def _schema_path(directory):
+    return os.path.join(directory, "schema.json")
+
+
+def load_schema(directory=EVENTS_DIR):
+    with open(_schema_path(directory)) as f:
+        schema = json.load(f)
+    dtype = np.dtype([tuple(field) if len(field) == 2 else (field[0], field[1], tuple(field[2]))
+                      for field in schema["dtype"]])
+    return dtype, schema["classes"]
+
+
+def _ensure_schema(directory, dtype, class_names):
+    os.makedirs(directory, exist_ok=True)
+    path = _schema_path(directory)
+    if os.path.exists(path):
+        existing, classes = load_schema(directory)
+        if existing != dtype or list(classes) != list(class_names):
+            raise ValueError(f"{directory} holds events with a different schema; use another AIRWASTE_EVENTS_DIR")
+        return
+    with open(path + ".tmp", "w") as f:
+        json.dump({"dtype": dtype.descr, "classes": list(class_names)}, f)
+    os.replace(path + ".tmp", path)
+
+
+class EventLog:
+    # Thread-safe; append() only buffers, a background thread writes every
+    # flush_rows events or flush_seconds, whichever comes first.
+
+    def __init__(
+        self,
+        directory=EVENTS_DIR,
+        bin_id=BIN_ID,
+        segment_rows=SEGMENT_ROWS,
+        flush_rows=FLUSH_ROWS,
+        flush_seconds=FLUSH_SECONDS,
+        class_names=CLASS_NAMES,
+    ):
+        self.directory = directory
+        self.bin_id = bin_id
+        self.segment_rows = segment_rows
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.dtype = event_dtype(len(class_names))
+        _ensure_schema(directory, self.dtype, class_names)
+        self.written = 0
+        self.segments = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._segment = None
+        self._segment_rows = 0
+        self._thread = threading.Thread(target=self._flush_loop, name="event-log", daemon=True)
+        self._thread.start()
+
+    def append(self, prediction, stages=None, source="snapshot", bin_id=None, ts=None):
+        probs = np.asarray(prediction, dtype=np.float32).ravel()
+        label = int(np.argmax(probs))
+        stages = stages or {}
+        row = (
+            time.time() if ts is None else ts,
+            (bin_id or self.bin_id).encode()[:16],
+            SOURCES.index(source),
+            label,
+            probs[label] * 100,
+            probs,
+            *[stages.get(stage, np.nan) for stage in STAGES],
+        )
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.flush_rows:
+                self._wake.set()
+
+    def append_many(self, records):
+        # Pre-built records of self.dtype (imports, --generate), written straight away
+        with self._write_lock:
+            self._write(np.asarray(records, dtype=self.dtype))
+
+    def _flush_loop(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if pending:
+            with self._write_lock:
+                self._write(np.array(pending, dtype=self.dtype))
+
+    def _roll(self, first_ts):
+        if self._segment is not None:
+            self._segment.close()
+        # Start time in the name keeps segments in order; the pid keeps
+        # concurrent writers (app, batch jobs) out of each other's files
+        name = f"events-{int(first_ts * 1000):013d}-{os.getpid()}.bin"
+        self._segment = open(os.path.join(self.directory, name), "ab")
+        self._segment_rows = 0
+        self.segments += 1
+
+    def _write(self, records):
+        with metrics.timer("event_flush"):
+            offset = 0
+            while offset < len(records):
+                if self._segment is None or self._segment_rows >= self.segment_rows:
+                    self._roll(float(records["ts"][offset]))
+                n = min(len(records) - offset, self.segment_rows - self._segment_rows)
+                self._segment.write(records[offset:offset + n].tobytes())
+                self._segment_rows += n
+                offset += n
+            self._segment.flush()
+        self.written += len(records)
+        metrics.inc("events_written_total", len(records))
+
+    def close(self):
+        self._closed.set()
+        self._wake.set()
+        self._thread.join(timeout=2)
+        self.flush()
+        with self._write_lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+    def stats(self):
+        return {"events_written": self.written, "events_pending": len(self._pending), "events_segments": self.segments}
+
+
+def segment_paths(directory=EVENTS_DIR):
+    return sorted(glob.glob(os.path.join(directory, "events-*.bin")))
+
+
+def open_segment(path, dtype):
+    # A crash can leave half a record at the end; it is ignored
+    rows = os.path.getsize(path) // dtype.itemsize
+    if rows == 0:
+        return None
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows,))
+
+
+def _to_epoch(value):
+    # Epoch seconds, datetime/date, or ISO string; naive times are UTC
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    elif not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+def scan(directory=EVENTS_DIR, start=None, end=None, bin_id=None, chunk_rows=CHUNK_ROWS):
+    # Yields filtered chunks of records; segments outside [start, end) are
+    # skipped by looking at their first and last timestamp only
+    dtype, _ = load_schema(directory)
+    start, end = _to_epoch(start), _to_epoch(end)
+    wanted_bin = bin_id.encode() if bin_id else None
+    for path in segment_paths(directory):
+        segment = open_segment(path, dtype)
+        if segment is None:
+            continue
+        if (start is not None and segment["ts"][-1] < start) or (end is not None and segment["ts"][0] >= end):
+            continue
+        for offset in range(0, len(segment), chunk_rows):
+            chunk = segment[offset:offset + chunk_rows]
+            mask = np.ones(len(chunk), dtype=bool)
+            if start is not None:
+                mask &= chunk["ts"] >= start
+            if end is not None:
+                mask &= chunk["ts"] < end
+            if wanted_bin is not None:
+                mask &= chunk["bin_id"] == wanted_bin
+            if mask.all():
+                yield chunk
+            elif mask.any():
+                yield chunk[mask]
+
+
+def hourly_counts(directory=EVENTS_DIR, start=None, end=None, bin_id=None):
+    # -> (hour start epochs, counts[hours, classes]), UTC hours
+    _, classes = load_schema(directory)
+    totals = {}
+    for chunk in scan(directory, start, end, bin_id):
+        keys = (chunk["ts"] // 3600).astype(np.int64) * len(classes) + chunk["label"]
+        values, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(values.tolist(), counts.tolist()):
+            totals[key] = totals.get(key, 0) + count
+    hours = sorted({key // len(classes) for key in totals})
+    table = np.zeros((len(hours), len(classes)), dtype=np.int64)
+    row = {hour: i for i, hour in enumerate(hours)}
+    for key, count in totals.items():
+        table[row[key // len(classes)], key % len(classes)] = count
+    return np.asarray(hours, dtype=np.int64) * 3600, table
+
+
+def confidence_histogram(directory=EVENTS_DIR, start=None, end=None, bin_id=None, bins=20):
+    # -> (bin edges in percent, counts[bins, classes]); the winning class'
+    # confidence is always >= 100 / num_classes
+    _, classes = load_schema(directory)
+    edges = np.linspace(100 / len(classes), 100, bins + 1)
+    counts = np.zeros((bins, len(classes)), dtype=np.int64)
+    for chunk in scan(directory, start, end, bin_id):
+        for label in range(len(classes)):
+            counts[:, label] += np.histogram(chunk["confidence"][chunk["label"] == label], edges)[0]
+    return edges, counts
+
+
+def _group_bins(bin_ids):
+    # np.unique on 16-byte strings is slow; fold each id into one uint64
+    # (collisions are not a concern for a fleet of bins) and group on that
+    words = np.ascontiguousarray(bin_ids).view("<u8").reshape(-1, 2)
+    keys = words[:, 0] * np.uint64(0x9E3779B97F4A7C15) ^ words[:, 1]
+    _, first, codes = np.unique(keys, return_index=True, return_inverse=True)
+    return bin_ids[first], codes
+
+
+def bin_summary(directory=EVENTS_DIR, start=None, end=None):
+    # Per bin: items per class, diversion rate (share recyclable), mean
+    # confidence and latency, last event time
+    _, classes = load_schema(directory)
+    summary = {}
+    for chunk in scan(directory, start, end):
+        bin_keys, codes = _group_bins(chunk["bin_id"])
+        counts = np.bincount(codes * len(classes) + chunk["label"], minlength=len(bin_keys) * len(classes))
+        confidence = np.bincount(codes, weights=chunk["confidence"], minlength=len(bin_keys))
+        timed = ~np.isnan(chunk["total_ms"])
+        latency = np.bincount(codes[timed], weights=chunk["total_ms"][timed], minlength=len(bin_keys))
+        latency_count = np.bincount(codes[timed], minlength=len(bin_keys))
+        last_seen = np.full(len(bin_keys), -np.inf)
+        np.maximum.at(last_seen, codes, chunk["ts"])
+        for i, bin_key in enumerate(bin_keys.tolist()):
+            entry = summary.setdefault(bin_key.decode(), {
+                "counts": np.zeros(len(classes), dtype=np.int64),
+                "confidence_sum": 0.0,
+                "latency_sum": 0.0,
+                "latency_count": 0,
+                "last_seen": 0.0,
+            })
+            entry["counts"] += counts[i * len(classes):(i + 1) * len(classes)]
+            entry["confidence_sum"] += confidence[i]
+            entry["latency_sum"] += latency[i]
+            entry["latency_count"] += int(latency_count[i])
+            entry["last_seen"] = max(entry["last_seen"], float(last_seen[i]))
+    result = []
+    for bin_id, entry in sorted(summary.items()):
+        total = int(entry["counts"].sum())
+        result.append({
+            "bin_id": bin_id,
+            "items": total,
+            **{name: int(count) for name, count in zip(classes, entry["counts"])},
+            "diversion_rate": float(entry["counts"][RECYCLABLE] / total) if total else 0.0,
+            "mean_confidence": float(entry["confidence_sum"] / total) if total else 0.0,
+            "mean_total_ms": float(entry["latency_sum"] / entry["latency_count"]) if entry["latency_count"] else None,
+            "last_seen": entry["last_seen"],
+        })
+    return result
+
+
+def synthetic_events(count, bins=4, days=90, seed=0, dtype=None):
+    dtype = dtype or event_dtype()
+    rng = np.random.default_rng(seed)
+    now = time.time()
+    records = np.zeros(count, dtype=dtype)
+    records["ts"] = np.sort(rng.uniform(now - days * 86400, now, count))
+    records["bin_id"] = np.char.encode(np.char.add("bin-", rng.integers(0, bins, count).astype(str)))
+    records["source"] = SOURCES.index("stream")
+    recyclable = rng.beta(2, 2, count).astype(np.float32)
+    records["probs"][:, RECYCLABLE] = recyclable
+    records["probs"][:, 1 - RECYCLABLE] = 1 - recyclable
+    records["label"] = records["probs"].argmax(axis=1)
+    records["confidence"] = records["probs"].max(axis=1) * 100
+    records["preprocess_ms"] = rng.gamma(4, 2, count)
+    records["predict_ms"] = rng.gamma(4, 8, count)
+    records["total_ms"] = records["preprocess_ms"] + records["predict_ms"]
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise the classification event log.")
+    parser.add_argument("--dir", default=EVENTS_DIR)
+    parser.add_argument("--since", help="Start time, e.g. 2024-06-01")
+    parser.add_argument("--until", help="End time (exclusive)")
+    parser.add_argument("--bin", help="Only this bin id (hourly counts)")
+    parser.add_argument("--generate", type=int, metavar="N", help="Append N synthetic events first")
+    args = parser.parse_args(argv)
+
+    if args.generate:
+        log = EventLog(args.dir)
+        start = time.perf_counter()
+        for offset in range(0, args.generate, CHUNK_ROWS):
+            log.append_many(synthetic_events(min(CHUNK_ROWS, args.generate - offset), seed=offset))
+        log.close()
+        print(f"Wrote {args.generate} events in {log.segments} segment(s) "
+              f"in {time.perf_counter() - start:.1f}s")
+    if not segment_paths(args.dir):
+        print(f"No events in {args.dir}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    summary = bin_summary(args.dir, args.since, args.until)
+    summary_ms = (time.perf_counter() - start) * 1000
+    for row in summary:
+        print(f"{row['bin_id']:<16} {row['items']:>10} items  diversion {row['diversion_rate'] * 100:5.1f}%  "
+              f"confidence {row['mean_confidence']:5.1f}%")
+    start = time.perf_counter()
+    hours, counts = hourly_counts(args.dir, args.since, args.until, args.bin)
+    hourly_ms = (time.perf_counter() - start) * 1000
+    print(f"{int(counts.sum())} events over {len(hours)} hours")
+    print(f"Query time: bin summary {summary_ms:.0f} ms, hourly counts {hourly_ms:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
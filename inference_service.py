@@ -0,0 +1,150 @@
+import collections
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+MAX_BATCH_SIZE = int(os.environ.get("AIRWASTE_MAX_BATCH", "32"))
+MAX_WAIT_MS = float(os.environ.get("AIRWASTE_MAX_WAIT_MS", "5"))
+MAX_QUEUE = int(os.environ.get("AIRWASTE_MAX_QUEUE", "256"))
+# How long predict() waits for queue space before giving up with ServiceBusy
+SUBMIT_TIMEOUT = float(os.environ.get("AIRWASTE_SUBMIT_TIMEOUT", "1.0"))
+
+
+class ServiceBusy(Exception):
+    # Raised instead of queueing without bound when the service is saturated
+    pass
+
+
+class _Request:
+    __slots__ = ("image", "future", "submitted_at")
+
+    def __init__(self, image):
+        self.image = image
+        self.future = Future()
+        self.submitted_at = time.perf_counter()
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class InferenceService:
+    # Dynamic micro-batching in front of one backend. Requests that arrive
+    # within max_wait_ms of the first queued one are stacked into a single
+    # predict() call of up to max_batch_size images. A single worker thread
+    # owns the model, so sessions never contend on it directly.
+    #
+    # Exposes the same predict(batch) / input_shape / name surface as the
+    # backends, so callers can use it as a drop-in model.
+    #
+    # Models that can run several batches at once (worker_pool.WorkerPool)
+    # advertise `concurrency`; that many dispatcher threads then collect and
+    # send batches in parallel.
+
+    def __init__(self, model, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, max_queue=MAX_QUEUE,
+                 dispatchers=None):
+        self.model = model
+        self.dispatchers = dispatchers or getattr(model, "concurrency", 1)
+        self.input_shape = model.input_shape
+        self.name = f"{model.name}, batched"
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._threads = []
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.rejected = 0
+        self.batches = 0
+        self.latencies_ms = collections.deque(maxlen=1000)
+        self.batch_sizes = collections.deque(maxlen=1000)
+
+    def start(self):
+        if not any(t.is_alive() for t in self._threads):
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"inference-service-{i}", daemon=True)
+                for i in range(self.dispatchers)
+            ]
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    def submit(self, image, timeout=0):
+        # timeout=0 rejects immediately when full, None blocks until there is room
+        request = _Request(image)
+        try:
+            if timeout == 0:
+                self._queue.put_nowait(request)
+            else:
+                self._queue.put(request, timeout=timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self.rejected += 1
+            raise ServiceBusy(f"Inference queue full ({self._queue.maxsize} pending requests)")
+        return request.future
+
+    def predict(self, batch, timeout=SUBMIT_TIMEOUT):
+        futures = [self.submit(image, timeout=timeout) for image in batch]
+        return np.stack([f.result() for f in futures])
+
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                predictions = self.model.predict(np.stack([r.image for r in batch]))
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            done_at = time.perf_counter()
+            for request, prediction in zip(batch, predictions):
+                request.future.set_result(prediction)
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.batch_sizes.append(len(batch))
+                self.latencies_ms.extend((done_at - r.submitted_at) * 1000 for r in batch)
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = sorted(self.latencies_ms)
+            sizes = list(self.batch_sizes)
+            return {
+                "service_requests": self.requests,
+                "service_rejected": self.rejected,
+                "service_batches": self.batches,
+                "service_queue_depth": self._queue.qsize(),
+                "service_mean_batch_size": sum(sizes) / len(sizes) if sizes else 0.0,
+                "service_latency_p50_ms": _percentile(latencies, 0.50),
+                "service_latency_p95_ms": _percentile(latencies, 0.95),
+                "service_latency_p99_ms": _percentile(latencies, 0.99),
+            }
@@ -0,0 +1,257 @@
+"""Fleet load generator: simulate N smart bins against the classifier.
+
+Each virtual bin emits JPEG frames at --fps with gamma-distributed gaps
+(--burstiness is the coefficient of variation: 0 = metronome, 1 = Poisson,
+>1 = bursty) and classifies them through the same path app.py uses:
+decode + preprocess, prediction cache (optional), the shared micro-batching
+InferenceService, label mapping. Like a camera session, a bin keeps at most
+one frame in flight; a frame that arrives while the previous one is still
+being classified is dropped.
+
+The bin count ramps up step by step and every step reports achieved
+throughput, latency percentiles, dropped frames and CPU/RSS, which locates
+the saturation point of a single node.
+
+    python loadgen.py --bins 1,2,4,8,16,32 --fps 2 --step-seconds 20
+    python loadgen.py --images samples/ --bins 10,50,100 --burstiness 2 --output bench/fleet.json
+"""
+import argparse
+import heapq
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+import backends
+import benchmark
+import classifier
+import inference_service
+import model_loader
+import prediction_cache
+import preprocessing
+import worker_pool
+from batch_classify import iter_image_paths
+from classifier import MODEL_PATH
+
+
+def load_frames(image_dir, count, resolution):
+    if image_dir:
+        paths = list(iter_image_paths([image_dir]))[:count]
+        if not paths:
+            raise SystemExit(f"No images found in {image_dir}")
+        frames = []
+        for path in paths:
+            with open(path, "rb") as f:
+                frames.append(f.read())
+        return frames
+    width, height = resolution
+    return [benchmark.synthetic_jpeg(width, height, seed=i) for i in range(count)]
+
+
+def load_model(args):
+    if args.backend == "keras" and not os.path.exists(args.model) and not worker_pool.POOL_WORKERS:
+        model, _ = benchmark.load_benchmark_model(args)
+        return model
+    # Same loader as the app, so AIRWASTE_POOL_WORKERS etc. apply
+    loader = model_loader.ModelLoader(args.backend, args.model, auto_export=False).start()
+    loader.wait()
+    model, error = loader.result()
+    if error:
+        raise SystemExit(f"Error loading model: {error}")
+    return model
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return benchmark.peak_rss_mb()
+
+
+class Fleet:
+    def __init__(self, model, frames, fps, burstiness, cache=None, seed=0):
+        self.model = model
+        self.frames = frames
+        self.fps = fps
+        self.burstiness = burstiness
+        self.cache = cache
+        self.rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.emitted = 0
+            self.classified = 0
+            self.dropped = 0
+            self.busy = 0
+            self.errors = 0
+            self.latencies_ms = []
+
+    def _gap(self):
+        mean = 1.0 / self.fps
+        if self.burstiness <= 0:
+            return mean
+        shape = 1.0 / self.burstiness ** 2
+        return self.rng.gamma(shape, mean / shape)
+
+    def classify(self, jpeg):
+        # app.py's snapshot path, minus the rendering
+        img = Image.open(io.BytesIO(jpeg))
+        img_array = preprocessing.get_preprocessor(tuple(self.model.input_shape))(img, reuse=True)
+        prediction = prediction_cache.cached_predict(self.model, img_array, self.cache)
+        return classifier.label_prediction(prediction)
+
+    def _handle(self, bin_state, jpeg, emitted_at):
+        try:
+            self.classify(jpeg)
+        except inference_service.ServiceBusy:
+            with self._lock:
+                self.busy += 1
+        except Exception:
+            with self._lock:
+                self.errors += 1
+        else:
+            with self._lock:
+                self.classified += 1
+                self.latencies_ms.append((time.perf_counter() - emitted_at) * 1000)
+        finally:
+            with self._lock:
+                bin_state["busy"] = False
+
+    def run(self, bins, seconds, executor):
+        # One scheduler thread emits frames for every bin in time order;
+        # classification runs on the executor, one thread per bin session
+        states = [{"busy": False, "frame": i % len(self.frames)} for i in range(bins)]
+        start = time.perf_counter()
+        schedule = [(start + self.rng.uniform(0, 1.0 / self.fps), i) for i in range(bins)]
+        heapq.heapify(schedule)
+        end = start + seconds
+        while schedule:
+            due, index = heapq.heappop(schedule)
+            if due >= end:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            state = states[index]
+            with self._lock:
+                self.emitted += 1
+                if state["busy"]:
+                    self.dropped += 1
+                    state = None
+            if state is not None:
+                state["busy"] = True
+                jpeg = self.frames[state["frame"]]
+                state["frame"] = (state["frame"] + bins) % len(self.frames)
+                # Latency counts from the scheduled time, so scheduler lag under load shows up too
+                executor.submit(self._handle, state, jpeg, due)
+            heapq.heappush(schedule, (due + self._gap(), index))
+        # Let in-flight frames finish so they count towards this step
+        while any(state["busy"] for state in states):
+            time.sleep(0.01)
+        return time.perf_counter() - start
+
+
+def run_step(fleet, bins, seconds, executor):
+    fleet.reset()
+    cpu_start = os.times()
+    elapsed = fleet.run(bins, seconds, executor)
+    cpu_end = os.times()
+    cpu_seconds = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+    latencies = np.asarray(fleet.latencies_ms) if fleet.latencies_ms else np.zeros(1)
+    return {
+        "bins": bins,
+        "offered_fps": bins * fleet.fps,
+        "emitted": fleet.emitted,
+        "classified": fleet.classified,
+        "throughput_fps": fleet.classified / elapsed,
+        "dropped": fleet.dropped,
+        "busy_rejected": fleet.busy,
+        "errors": fleet.errors,
+        "drop_ratio": (fleet.dropped + fleet.busy) / fleet.emitted if fleet.emitted else 0.0,
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p95_ms": float(np.percentile(latencies, 95)),
+        "latency_p99_ms": float(np.percentile(latencies, 99)),
+        "cpu_cores_used": cpu_seconds / elapsed,
+        "rss_mb": current_rss_mb(),
+    }
+
+
+def saturated(step, args):
+    return step["drop_ratio"] > args.max_drop or step["latency_p95_ms"] > args.slo_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a fleet of smart bins against the classifier.")
+    parser.add_argument("--bins", default="1,2,4,8,16,32", help="Bin counts to ramp through")
+    parser.add_argument("--fps", type=float, default=2.0, help="Frames per second per bin")
+    parser.add_argument("--burstiness", type=float, default=1.0, help="Gap coefficient of variation (1 = Poisson)")
+    parser.add_argument("--step-seconds", type=float, default=20)
+    parser.add_argument("--images", help="Folder of sample images (default: synthetic frames)")
+    parser.add_argument("--resolution", default="1280x720", help="Synthetic frame size")
+    parser.add_argument("--frames", type=int, default=64, help="Distinct frames to cycle through")
+    parser.add_argument("--cache", action="store_true", help="Use the prediction cache like the app does")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", choices=backends.BACKENDS, default=backends.BACKEND)
+    parser.add_argument("--input-shape", default="224,224,3", help="Stand-in model input shape when the .h5 is missing")
+    parser.add_argument("--slo-ms", type=float, default=500, help="p95 latency that counts as saturated")
+    parser.add_argument("--max-drop", type=float, default=0.05, help="Drop ratio that counts as saturated")
+    parser.add_argument("--output", help="Write the ramp report as JSON")
+    args = parser.parse_args(argv)
+
+    bin_counts = [int(b) for b in args.bins.split(",")]
+    frames = load_frames(args.images, args.frames, tuple(int(v) for v in args.resolution.split("x")))
+    service = inference_service.InferenceService(load_model(args)).start()
+    cache = prediction_cache.PredictionCache() if args.cache else None
+    fleet = Fleet(service, frames, args.fps, args.burstiness, cache)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpu_count": os.cpu_count(),
+        "model": service.name,
+        "fps_per_bin": args.fps,
+        "burstiness": args.burstiness,
+        "frames": "synthetic " + args.resolution if not args.images else args.images,
+        "steps": [],
+        "saturation_bins": None,
+    }
+    print(f"{'bins':>5} {'offered':>8} {'achieved':>8} {'drop%':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'cpu':>5} {'rss MB':>7}")
+    try:
+        with ThreadPoolExecutor(max_workers=max(bin_counts)) as executor:
+            for bins in bin_counts:
+                step = run_step(fleet, bins, args.step_seconds, executor)
+                step["service"] = service.stats()
+                report["steps"].append(step)
+                marker = ""
+                if report["saturation_bins"] is None and saturated(step, args):
+                    report["saturation_bins"] = bins
+                    marker = "  <-- saturated"
+                print(f"{bins:>5} {step['offered_fps']:>8.1f} {step['throughput_fps']:>8.1f} "
+                      f"{step['drop_ratio'] * 100:>6.1f} {step['latency_p50_ms']:>8.1f} {step['latency_p95_ms']:>8.1f} "
+                      f"{step['latency_p99_ms']:>8.1f} {step['cpu_cores_used']:>5.2f} {step['rss_mb'] or 0:>7.0f}{marker}")
+    finally:
+        service.stop()
+
+    if report["saturation_bins"] is None:
+        print(f"No saturation up to {bin_counts[-1]} bins (p95 <= {args.slo_ms:.0f} ms, drops <= {args.max_drop * 100:.0f}%)")
+    else:
+        print(f"Saturated at {report['saturation_bins']} bins ({report['saturation_bins'] * args.fps:.0f} frames/s offered)")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""Lightweight hot-path metrics: stage timers, counters and an optional JSONL trace.
+
+    with metrics.timer("predict"):
+        ...
+    metrics.inc("predictions_total", label="Organic")
+
+Everything is a no-op when AIRWASTE_METRICS=0. Exposed as Prometheus text or
+JSON (render_prometheus / snapshot, or over HTTP with serve()), in the app's
+Diagnostics sidebar, and as an append-only JSONL trace when AIRWASTE_TRACE_PATH
+is set.
+"""
+import collections
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get("AIRWASTE_METRICS", "1") != "0"
+TRACE_PATH = os.environ.get("AIRWASTE_TRACE_PATH")
+METRICS_PORT = int(os.environ.get("AIRWASTE_METRICS_PORT", "0")) or None
+WINDOW = 1024  # samples kept per histogram for percentiles
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _Histogram:
+    __slots__ = ("samples", "count", "total")
+
+    def __init__(self):
+        self.samples = collections.deque(maxlen=WINDOW)
+        self.count = 0
+        self.total = 0.0
+
+    def quantiles(self):
+        values = sorted(self.samples)
+        if not values:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: values[min(len(values) - 1, int(len(values) * q))] for q in QUANTILES}
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "start", "ms")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.ms = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.ms = (time.perf_counter() - self.start) * 1000
+        self.registry.observe(self.name, self.ms)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+    ms = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Registry:
+    def __init__(self, enabled=ENABLED, trace_path=TRACE_PATH):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self._lock = threading.Lock()
+        self._histograms = collections.defaultdict(_Histogram)
+        self._counters = collections.Counter()
+        # name -> callable returning {metric: value}, read at export time
+        self._collectors = {}
+        self._trace_file = None
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name, ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self._histograms[name]
+            hist.samples.append(ms)
+            hist.count += 1
+            hist.total += ms
+
+    def inc(self, name, value=1, label=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(name, label)] += value
+
+    def register_collector(self, name, collect):
+        self._collectors[name] = collect
+
+    def trace(self, event):
+        if not (self.enabled and self.trace_path):
+            return
+        line = json.dumps({"ts": time.time(), **event}, default=float) + "\n"
+        with self._lock:
+            if self._trace_file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.trace_path)), exist_ok=True)
+                self._trace_file = open(self.trace_path, "a", buffering=1)
+            self._trace_file.write(line)
+
+    def _gauges(self):
+        gauges = {}
+        for collect in list(self._collectors.values()):
+            try:
+                for key, value in collect().items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        gauges[key] = value
+            except Exception:
+                continue
+        return gauges
+
+    def snapshot(self):
+        with self._lock:
+            stages = {
+                name: {
+                    "count": hist.count,
+                    "mean_ms": hist.total / hist.count if hist.count else 0.0,
+                    **{f"p{int(q * 100)}_ms": v for q, v in hist.quantiles().items()},
+                }
+                for name, hist in self._histograms.items()
+            }
+            counters = {}
+            for (name, label), value in self._counters.items():
+                counters[f"{name}{{{label}}}" if label else name] = value
+        return {"enabled": self.enabled, "stages": stages, "counters": counters, "gauges": self._gauges()}
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            if self._histograms:
+                lines.append("# TYPE airwaste_stage_latency_ms summary")
+            for name, hist in sorted(self._histograms.items()):
+                for q, v in hist.quantiles().items():
+                    lines.append(f'airwaste_stage_latency_ms{{stage="{name}",quantile="{q}"}} {v:.3f}')
+                lines.append(f'airwaste_stage_latency_ms_sum{{stage="{name}"}} {hist.total:.3f}')
+                lines.append(f'airwaste_stage_latency_ms_count{{stage="{name}"}} {hist.count}')
+            seen = set()
+            for (name, label), value in sorted(self._counters.items(), key=lambda kv: (kv[0][0], kv[0][1] or "")):
+                if name not in seen:
+                    lines.append(f"# TYPE airwaste_{name} counter")
+                    seen.add(name)
+                labels = f'{{label="{label}"}}' if label else ""
+                lines.append(f"airwaste_{name}{labels} {value}")
+        for key, value in sorted(self._gauges().items()):
+            lines.append(f"# TYPE airwaste_{key} gauge")
+            lines.append(f"airwaste_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+REGISTRY = Registry()
+
+timer = REGISTRY.timer
+observe = REGISTRY.observe
+inc = REGISTRY.inc
+trace = REGISTRY.trace
+register_collector = REGISTRY.register_collector
+snapshot = REGISTRY.snapshot
+render_prometheus = REGISTRY.render_prometheus
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path in ("/metrics", "/"):
+            body = self.registry.render_prometheus().encode()
+            content_type = "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body = json.dumps(self.registry.snapshot()).encode()
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port=METRICS_PORT, host="0.0.0.0"):
+    # /metrics (Prometheus text) and /metrics.json on a daemon thread
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,174 @@
+"""Background model loading with timed startup phases.
+
+The app renders its shell immediately and polls a ModelLoader, which imports
+TensorFlow, loads the model (preferring the pre-converted SavedModel when it is
+newer than the .h5), runs a warm-up inference so the first real frame does not
+pay tracing cost, and exports the SavedModel for the next cold start if needed.
+
+    python model_loader.py            # time a cold start
+    python model_loader.py --export   # build the SavedModel artifact once
+"""
+import argparse
+import collections
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import backends
+import cascade
+import metrics
+import worker_pool
+from classifier import MODEL_PATH
+
+PREFER_ARTIFACT = os.environ.get("AIRWASTE_PREFER_ARTIFACT", "1") != "0"
+AUTO_EXPORT = os.environ.get("AIRWASTE_AUTO_EXPORT", "1") != "0"
+WARMUP_BATCH_SIZES = tuple(int(b) for b in os.environ.get("AIRWASTE_WARMUP_BATCHES", "1").split(","))
+
+
+class ModelLoader:
+    def __init__(
+        self,
+        kind=backends.BACKEND,
+        model_path=MODEL_PATH,
+        savedmodel_path=backends.SAVEDMODEL_PATH,
+        prefer_artifact=PREFER_ARTIFACT,
+        auto_export=AUTO_EXPORT,
+        warmup_batch_sizes=WARMUP_BATCH_SIZES,
+        pool_workers=worker_pool.POOL_WORKERS,
+        use_cascade=cascade.CASCADE_ENABLED,
+    ):
+        self.kind = kind
+        self.model_path = model_path
+        self.savedmodel_path = savedmodel_path
+        self.prefer_artifact = prefer_artifact
+        self.auto_export = auto_export
+        self.warmup_batch_sizes = warmup_batch_sizes
+        # > 0: the model lives in worker processes (worker_pool.py), not in this one
+        self.pool_workers = pool_workers
+        # Put a fast model in front of the loaded one (cascade.py)
+        self.use_cascade = use_cascade
+        self.phase = "pending"
+        self.phases = collections.OrderedDict()  # phase name -> ms
+        self.model = None
+        self.error = None
+        # The export runs after _ready, so it is timed here and never in phases
+        self.export_ms = None
+        self.export_error = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+            self._thread.start()
+        return self
+
+    @property
+    def done(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def result(self):
+        return self.model, self.error
+
+    def _timed(self, name, fn):
+        self.phase = name
+        start = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            self.phases[name] = (time.perf_counter() - start) * 1000
+            metrics.observe(f"startup_{name}", self.phases[name])
+
+    def _load(self):
+        if self.pool_workers:
+            kind = self.kind
+            if kind == "keras" and self.prefer_artifact and backends.savedmodel_is_fresh(self.savedmodel_path, self.model_path):
+                kind = "savedmodel"
+            return worker_pool.load_pool(kind, self.savedmodel_path if kind == "savedmodel" else self.model_path,
+                                         self.pool_workers)
+        if self.kind == "keras" and self.prefer_artifact and backends.savedmodel_is_fresh(self.savedmodel_path, self.model_path):
+            model, error = backends.load_backend("savedmodel", savedmodel_path=self.savedmodel_path)
+            if not error:
+                return model, None
+        return backends.load_backend(self.kind, self.model_path, savedmodel_path=self.savedmodel_path)
+
+    def _warmup(self):
+        # A cascade's tiers are warmed directly so the zero batches do not
+        # show up in its hit rate, escalation and audit counters
+        models = [self.model.fast, self.model.full] if isinstance(self.model, cascade.CascadeModel) else [self.model]
+        for model in models:
+            for batch_size in self.warmup_batch_sizes:
+                model.predict(np.zeros((batch_size, *model.input_shape[1:]), dtype=np.float32))
+
+    def _run(self):
+        start = time.perf_counter()
+        full = None
+        try:
+            if self.kind in ("keras", "savedmodel") and not self.pool_workers:
+                self._timed("import_tensorflow", lambda: __import__("tensorflow"))
+            self.model, self.error = self._timed("load_model", self._load)
+            full = self.model
+            if self.model is not None and self.use_cascade:
+                self.model, self.error = self._timed("load_cascade", lambda: cascade.load_cascade(full))
+            if self.model is not None:
+                self._timed("warmup", self._warmup)
+        except Exception as e:
+            self.model, self.error = None, str(e)
+        finally:
+            self.phases["total"] = (time.perf_counter() - start) * 1000
+            self.phase = "failed" if self.error else "ready"
+            self._ready.set()
+
+        # After the app is serving: leave a faster artifact for the next cold start
+        if self.auto_export and self.model is not None and full.name == "keras":
+            start = time.perf_counter()
+            try:
+                backends.export_savedmodel(full.model, self.savedmodel_path)
+            except Exception as e:
+                self.export_error = str(e)
+            finally:
+                self.export_ms = (time.perf_counter() - start) * 1000
+                metrics.observe("export_artifact", self.export_ms)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time a cold model load, or build the fast-loading SavedModel.")
+    parser.add_argument("--backend", choices=backends.BACKENDS, default=backends.BACKEND)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--savedmodel", default=backends.SAVEDMODEL_PATH)
+    parser.add_argument("--export", action="store_true", help="Export the SavedModel artifact from the .h5")
+    args = parser.parse_args(argv)
+
+    if args.export:
+        start = time.perf_counter()
+        model, error = backends.load_backend("keras", args.model)
+        if error:
+            print(f"Error loading model: {error}", file=sys.stderr)
+            return 1
+        h5_ms = (time.perf_counter() - start) * 1000
+        backends.export_savedmodel(model.model, args.savedmodel)
+        start = time.perf_counter()
+        backends.SavedModelBackend(args.savedmodel)
+        print(f"Wrote {args.savedmodel}")
+        print(f"Load time: .h5 {h5_ms:.0f} ms (incl. TensorFlow import), SavedModel {(time.perf_counter() - start) * 1000:.0f} ms")
+        return 0
+
+    loader = ModelLoader(args.backend, args.model, args.savedmodel, auto_export=False).start()
+    loader.wait()
+    for name, ms in loader.phases.items():
+        print(f"{name:<18} {ms:9.0f} ms")
+    if loader.error:
+        print(f"Error loading model: {loader.error}", file=sys.stderr)
+        return 1
+    print(f"Loaded with the {loader.model.name} backend")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
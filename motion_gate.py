@@ -0,0 +1,133 @@
+import os
+
+import cv2
+import numpy as np
+
+import metrics
+
+# Gate thresholds, overridable per bin via environment variables
+GATE_METHOD = os.environ.get("AIRWASTE_GATE_METHOD", "diff")  # "diff" or "mog2"
+GATE_DOWNSCALE = int(os.environ.get("AIRWASTE_GATE_SIZE", "64"))
+GATE_PIXEL_THRESHOLD = int(os.environ.get("AIRWASTE_GATE_PIXEL_THRESHOLD", "25"))
+GATE_MOTION_RATIO = float(os.environ.get("AIRWASTE_GATE_MOTION_RATIO", "0.02"))
+GATE_SETTLE_FRAMES = int(os.environ.get("AIRWASTE_GATE_SETTLE_FRAMES", "3"))
+
+
+class MotionGate:
+    # Decides per frame whether the CNN has to run. A frame is classified once
+    # the scene has changed (something was dropped in / taken out) and has
+    # then been still for `settle_frames` frames; every other frame reuses the
+    # previous verdict.
+    #
+    # Both methods detect motion and settling by comparing each downscaled
+    # grayscale frame with the previous one, and only classify a settled
+    # scene that holds an item, so taking an item out does not classify the
+    # empty bin. "diff" decides presence against a reference frame of the
+    # empty scene: the first settled frame after start / reset(), so the
+    # stream has to start on an empty bin. "mog2" uses OpenCV's background
+    # subtractor instead, which adapts to slow lighting changes; its mask
+    # means "differs from the background", not "moving", so it only decides
+    # presence, never settling.
+
+    def __init__(
+        self,
+        method=GATE_METHOD,
+        downscale=GATE_DOWNSCALE,
+        pixel_threshold=GATE_PIXEL_THRESHOLD,
+        motion_ratio=GATE_MOTION_RATIO,
+        settle_frames=GATE_SETTLE_FRAMES,
+    ):
+        if method not in ("diff", "mog2"):
+            raise ValueError(f"Unknown gate method {method!r}")
+        self.method = method
+        self.downscale = downscale
+        self.pixel_threshold = pixel_threshold
+        self.motion_ratio = motion_ratio
+        self.settle_frames = settle_frames
+        self._subtractor = (
+            cv2.createBackgroundSubtractorMOG2(history=300, varThreshold=16, detectShadows=False)
+            if method == "mog2"
+            else None
+        )
+        self._previous = None
+        self._reference = None  # empty scene, "diff" only
+        self._still_frames = 0
+        self._pending = True  # classify the first settled frame
+        self.present = True
+        self.frames = 0
+        self.inferences = 0
+        self.skipped = 0
+
+    def _small_gray(self, frame):
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(frame, (self.downscale, self.downscale), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _diff_ratio(self, a, b):
+        mask = cv2.absdiff(a, b) > self.pixel_threshold
+        return float(np.count_nonzero(mask)) / mask.size
+
+    def _changed_ratio(self, small):
+        if self._previous is None:
+            self._previous = small
+            return 1.0
+        ratio = self._diff_ratio(small, self._previous)
+        self._previous = small
+        return ratio
+
+    def _foreground_ratio(self, small):
+        # learningRate -1 = automatic; the mask is 255 where the scene differs from background
+        mask = self._subtractor.apply(small, learningRate=-1)
+        return float(np.count_nonzero(mask)) / mask.size
+
+    def should_classify(self, frame):
+        self.frames += 1
+        small = self._small_gray(frame)
+        moving = self._changed_ratio(small) > self.motion_ratio
+        if self._subtractor is not None:
+            self.present = self._foreground_ratio(small) > self.motion_ratio
+        elif self._reference is not None:
+            self.present = self._diff_ratio(small, self._reference) > self.motion_ratio
+
+        if moving:
+            self._still_frames = 0
+            self._pending = True
+        else:
+            self._still_frames += 1
+
+        if self._pending and self._still_frames >= self.settle_frames:
+            self._pending = False
+            if self._subtractor is None and self._reference is None:
+                # First settled scene: taken as the empty bin, not classified
+                self._reference = small
+                self.present = False
+            # A scene that settled back to the empty background (item taken
+            # out) keeps the previous verdict
+            if self.present:
+                self.inferences += 1
+                metrics.inc("gate_passed_total")
+                return True
+        self.skipped += 1
+        metrics.inc("gate_skipped_total")
+        return False
+
+    def rearm(self):
+        # The released frame was not classified (e.g. the service was busy):
+        # release the next settled frame instead
+        self._pending = True
+
+    def reset(self):
+        self._previous = None
+        self._reference = None
+        self._still_frames = 0
+        self._pending = True
+        self.present = True
+
+    def stats(self):
+        return {
+            "gate_frames": self.frames,
+            "gate_inferences": self.inferences,
+            "gate_skipped": self.skipped,
+            "gate_skip_ratio": self.skipped / self.frames if self.frames else 0.0,
+        }
@@ -0,0 +1,212 @@
+"""Multi-item classification of one high-resolution frame.
+
+Splits the full-resolution frame into regions, either a fixed grid of
+overlapping tiles or candidate boxes from OpenCV contour detection, crops
+and preprocesses every region into one batch and classifies them with a
+single predict() call. Batching makes the cost per region fall as the
+region count grows (see --scaling).
+
+    python multi_item.py pile.jpg --method contours --output pile-overlay.jpg
+    python multi_item.py pile.jpg --method tiles --grid 4x4 --scaling
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import backends
+import classifier
+import preprocessing
+from classifier import MODEL_PATH
+
+METHODS = ("tiles", "contours")
+TILE_GRID = os.environ.get("AIRWASTE_TILE_GRID", "2x2")  # columns x rows
+TILE_OVERLAP = float(os.environ.get("AIRWASTE_TILE_OVERLAP", "0.15"))
+# Smallest candidate box, as a share of the frame area
+CONTOUR_MIN_AREA = float(os.environ.get("AIRWASTE_CONTOUR_MIN_AREA", "0.01"))
+MAX_REGIONS = int(os.environ.get("AIRWASTE_MAX_REGIONS", "16"))
+CONTOUR_WIDTH = 640  # contours are found on a downscaled copy
+
+# Same colours as the bins and the result card
+CLASS_COLORS = {"Organic": (34, 197, 94), "Recyclable": (37, 99, 235)}
+
+
+def parse_grid(grid):
+    columns, rows = (int(v) for v in grid.lower().split("x"))
+    return columns, rows
+
+
+def tile_regions(size, grid=TILE_GRID, overlap=TILE_OVERLAP):
+    # (left, top, right, bottom) boxes; each tile grows by `overlap` of its
+    # size so items on a tile border are still seen whole by one tile
+    width, height = size
+    columns, rows = parse_grid(grid)
+    tile_w, tile_h = width / columns, height / rows
+    pad_w, pad_h = tile_w * overlap / 2, tile_h * overlap / 2
+    regions = []
+    for row in range(rows):
+        for column in range(columns):
+            regions.append((
+                max(0, int(column * tile_w - pad_w)),
+                max(0, int(row * tile_h - pad_h)),
+                min(width, int((column + 1) * tile_w + pad_w)),
+                min(height, int((row + 1) * tile_h + pad_h)),
+            ))
+    return regions
+
+
+def contour_regions(img, min_area=CONTOUR_MIN_AREA, max_regions=MAX_REGIONS, pad=0.1):
+    rgb = np.asarray(img.convert("RGB"))
+    height, width = rgb.shape[:2]
+    scale = min(1.0, CONTOUR_WIDTH / width)
+    small = cv2.resize(rgb, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA) if scale < 1 else rgb
+    gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_RGB2GRAY), (5, 5), 0)
+    edges = cv2.dilate(cv2.Canny(gray, 50, 150), np.ones((5, 5), np.uint8), iterations=2)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    frame_area = small.shape[0] * small.shape[1]
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if min_area * frame_area <= w * h <= 0.95 * frame_area:
+            boxes.append((x, y, x + w, y + h))
+    boxes.sort(key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True)
+
+    kept = []
+    for box in boxes:
+        area = (box[2] - box[0]) * (box[3] - box[1])
+        # Skip boxes that mostly sit inside a bigger one already kept
+        if any(_overlap(box, other) > 0.8 * area for other in kept):
+            continue
+        kept.append(box)
+        if len(kept) == max_regions:
+            break
+    if not kept:
+        return [(0, 0, width, height)]
+
+    regions = []
+    for left, top, right, bottom in kept:
+        pad_w, pad_h = (right - left) * pad, (bottom - top) * pad
+        regions.append((
+            max(0, int((left - pad_w) / scale)),
+            max(0, int((top - pad_h) / scale)),
+            min(width, int((right + pad_w) / scale)),
+            min(height, int((bottom + pad_h) / scale)),
+        ))
+    return regions
+
+
+def _overlap(a, b):
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0
+
+
+def find_regions(img, method="tiles", grid=TILE_GRID):
+    if method == "tiles":
+        return tile_regions(img.size, grid)
+    if method == "contours":
+        return contour_regions(img)
+    raise ValueError(f"Unknown region method {method!r}, expected one of {', '.join(METHODS)}")
+
+
+def dominant_region(regions):
+    # Index of the largest region, the item the result card and bins follow
+    return int(np.argmax([(right - left) * (bottom - top) for left, top, right, bottom in regions]))
+
+
+def preprocess_regions(img, regions, input_shape):
+    # Crops come from the full-resolution frame, not the model-sized thumbnail
+    preprocessor = preprocessing.get_preprocessor(tuple(input_shape))
+    img = img.convert(preprocessor.mode)
+    return preprocessor.normalize_batch([preprocessor.decode(img.crop(box)) for box in regions])
+
+
+def classify_regions(model, img, regions):
+    return label_regions(regions, model.predict(preprocess_regions(img, regions, model.input_shape)))
+
+
+def label_regions(regions, predictions):
+    results = []
+    for box, prediction in zip(regions, predictions):
+        label, confidence = classifier.label_prediction(prediction)
+        results.append({"box": box, "label": label, "confidence": confidence, "prediction": prediction})
+    return results
+
+
+def draw_overlay(img, results):
+    overlay = img.convert("RGB")
+    draw = ImageDraw.Draw(overlay)
+    line = max(2, overlay.width // 300)
+    font = ImageFont.load_default()
+    for result in results:
+        color = CLASS_COLORS.get(result["label"], (255, 255, 255))
+        left, top, right, bottom = result["box"]
+        draw.rectangle(result["box"], outline=color, width=line)
+        text = f"{result['label']} {result['confidence']:.0f}%"
+        text_box = draw.textbbox((left + line, top + line), text, font=font)
+        draw.rectangle((text_box[0] - 2, text_box[1] - 2, text_box[2] + 2, text_box[3] + 2), fill=color)
+        draw.text((left + line, top + line), text, fill=(255, 255, 255), font=font)
+    return overlay
+
+
+def _scaling(model, img, regions, repeats=5):
+    # Batched (one predict for all regions) vs one predict per region
+    print(f"{'regions':>7} {'batched ms':>10} {'per region':>10} {'sequential ms':>13} {'speedup':>8}")
+    counts = sorted({1, 2, 4, 8, 16, len(regions)} & set(range(1, len(regions) + 1)))
+    for count in counts:
+        batch = preprocess_regions(img, regions[:count], model.input_shape).copy()
+        model.predict(batch)  # warm-up for this batch size
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model.predict(batch)
+        batched = (time.perf_counter() - start) * 1000 / repeats
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for i in range(count):
+                model.predict(batch[i:i + 1])
+        sequential = (time.perf_counter() - start) * 1000 / repeats
+        print(f"{count:>7} {batched:>10.1f} {batched / count:>10.1f} {sequential:>13.1f} {sequential / batched:>7.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify every item in one high-resolution frame in one batch.")
+    parser.add_argument("image")
+    parser.add_argument("--method", choices=METHODS, default="contours")
+    parser.add_argument("--grid", default=TILE_GRID, help="Tile grid, columns x rows (tiles method)")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", choices=backends.BACKENDS, default=backends.BACKEND)
+    parser.add_argument("--output", help="Write the image with region overlays here")
+    parser.add_argument("--scaling", action="store_true", help="Compare batched and per-region predict cost")
+    args = parser.parse_args(argv)
+
+    model, error = backends.load_backend(args.backend, args.model)
+    if error:
+        print(f"Error loading model: {error}", file=sys.stderr)
+        return 1
+    img = Image.open(args.image)
+    img.load()
+
+    start = time.perf_counter()
+    regions = find_regions(img, args.method, args.grid)
+    found = time.perf_counter()
+    results = classify_regions(model, img, regions)
+    done = time.perf_counter()
+    for result in results:
+        print(f"{str(result['box']):<28} {result['label']:<12} {result['confidence']:5.1f}%")
+    print(f"{len(regions)} regions: find {(found - start) * 1000:.0f} ms, "
+          f"preprocess + predict {(done - found) * 1000:.0f} ms")
+    if args.output:
+        draw_overlay(img, results).save(args.output)
+        print(f"Wrote {args.output}")
+    if args.scaling:
+        _scaling(model, img, regions)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
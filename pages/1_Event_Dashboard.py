@@ -0,0 +1,75 @@
+import datetime
+import os
+import time
+
+import pandas as pd
+import streamlit as st
+
+import event_store
+
+st.set_page_config(page_title="Smart Waste Dashboard", layout="wide")
+
+st.markdown("""
+<div style="display: flex; align-items: center; margin-bottom: 1rem;">
+    <svg width="28" height="28" viewBox="0 0 24 24" fill="#667eea" style="margin-right: 8px;">
+        <path d="M3,3H5V13H9V7H13V11H17V5H21V21H3V3M7,21H11V15H7V21M15,21H19V13H15V21Z"/>
+    </svg>
+    <h2 style="margin: 0;">Bin Activity</h2>
+</div>
+""", unsafe_allow_html=True)
+
+directory = event_store.EVENTS_DIR
+if not os.path.exists(os.path.join(directory, "schema.json")) or not event_store.segment_paths(directory):
+    st.info(f"No classification events recorded in `{directory}` yet.")
+    st.stop()
+
+today = datetime.datetime.now(datetime.timezone.utc).date()
+date_range = st.sidebar.date_input("Period (UTC)", (today - datetime.timedelta(days=7), today), key="dashboard_period")
+if not isinstance(date_range, (tuple, list)) or len(date_range) != 2:
+    st.stop()
+start, end = date_range[0], date_range[1] + datetime.timedelta(days=1)
+
+# Queries scan the memory-mapped segments; cached briefly so widget changes
+# don't rescan while new events keep arriving
+@st.cache_data(ttl=30, show_spinner="Aggregating events...")
+def load_summary(start, end, bin_id):
+    started = time.perf_counter()
+    summary = event_store.bin_summary(directory, start, end)
+    hours, counts = event_store.hourly_counts(directory, start, end, bin_id)
+    edges, histogram = event_store.confidence_histogram(directory, start, end, bin_id)
+    return summary, hours, counts, edges, histogram, (time.perf_counter() - started) * 1000
+
+_, classes = event_store.load_schema(directory)
+all_bins, *_ = load_summary(start, end, None)
+bin_choice = st.sidebar.selectbox("Bin", ["All bins"] + [row["bin_id"] for row in all_bins], key="dashboard_bin")
+bin_id = None if bin_choice == "All bins" else bin_choice
+summary, hours, counts, edges, histogram, query_ms = load_summary(start, end, bin_id)
+if bin_id is not None:
+    summary = [row for row in summary if row["bin_id"] == bin_id]
+
+items = sum(row["items"] for row in summary)
+recyclable = sum(row["Recyclable"] for row in summary)
+col1, col2, col3 = st.columns(3)
+col1.metric("Items classified", f"{items:,}")
+col2.metric("Diversion rate", f"{recyclable / items * 100:.1f}%" if items else "-")
+col3.metric("Mean confidence",
+            f"{sum(row['mean_confidence'] * row['items'] for row in summary) / items:.1f}%" if items else "-")
+
+st.markdown("#### Items per hour")
+hourly = pd.DataFrame(counts, columns=classes, index=pd.to_datetime(hours, unit="s"))
+st.bar_chart(hourly, color=["#22c55e", "#2563eb"][:len(classes)])
+
+st.markdown("#### Confidence distribution")
+labels = [f"{lo:.0f}-{hi:.0f}%" for lo, hi in zip(edges[:-1], edges[1:])]
+st.bar_chart(pd.DataFrame(histogram, columns=classes, index=labels), color=["#22c55e", "#2563eb"][:len(classes)])
+
+st.markdown("#### Per bin")
+table = pd.DataFrame(summary)
+if not table.empty:
+    table["diversion_rate"] = (table["diversion_rate"] * 100).round(1)
+    table["mean_confidence"] = table["mean_confidence"].round(1)
+    table["last_seen"] = pd.to_datetime(table["last_seen"], unit="s")
+st.dataframe(table, use_container_width=True, hide_index=True)
+
+st.caption(f"{int(counts.sum()):,} events in {len(event_store.segment_paths(directory))} segment(s) · "
+           f"query {query_ms:.0f} ms")
@@ -0,0 +1,119 @@
+import collections
+import hashlib
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+CACHE_SIZE = int(os.environ.get("AIRWASTE_CACHE_SIZE", "1024"))
+# Max differing bits (out of 768) for two frames to count as the same item.
+# 0 = exact match on the quantised model input; anything above that trades
+# accuracy for hit rate and can return another item's verdict.
+CACHE_MAX_DISTANCE = int(os.environ.get("AIRWASTE_CACHE_DISTANCE", "0"))
+# The app only uses the cache in near-duplicate mode: its snapshot reruns are
+# deduplicated per photo, gated stream frames bypass the cache and live camera
+# frames are never byte-identical, so an exact-match cache would never hit.
+# No tolerance has a measured false-hit rate yet, so it is off by default.
+CACHE_ENABLED = CACHE_MAX_DISTANCE > 0
+HASH_SIZE = 16
+
+
+def image_hash(img_array):
+    # Exact key: 64-bit digest of the model input quantised to uint8, so only
+    # frames the model would see as (near-)identical pixels share an entry
+    pixels = np.uint8(np.clip(np.asarray(img_array) * 255 + 0.5, 0, 255))
+    return int.from_bytes(hashlib.blake2b(pixels.tobytes(), digest_size=8).digest(), "big")
+
+
+def perceptual_hash(img_array, size=HASH_SIZE):
+    # Difference hash per colour channel of the preprocessed model input:
+    # shrink to (size+1) x size, one bit per "left pixel brighter than right
+    # neighbour" -> 3 * size * size bits. Only used with max_distance > 0.
+    pixels = np.asarray(img_array)
+    channels = [pixels[..., c] for c in range(pixels.shape[-1])] if pixels.ndim == 3 else [pixels]
+    bits = []
+    for channel in channels:
+        small = Image.fromarray(np.uint8(np.clip(channel * 255, 0, 255))).resize((size + 1, size), Image.BILINEAR)
+        values = np.asarray(small, dtype=np.int16)
+        bits.append((values[:, :-1] > values[:, 1:]).flatten())
+    return int.from_bytes(np.packbits(np.concatenate(bits)).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class PredictionCache:
+    # LRU map from image key to prediction vector. With max_distance 0 the key
+    # is an exact digest of the model input; otherwise it is a perceptual hash
+    # and lookups fall back to the closest stored hash within max_distance
+    # bits. Shared by every Streamlit session, hence the lock.
+
+    def __init__(self, capacity=CACHE_SIZE, max_distance=CACHE_MAX_DISTANCE):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, img_array):
+        return perceptual_hash(img_array) if self.max_distance > 0 else image_hash(img_array)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            if self.max_distance > 0:
+                best_key, best_distance = None, self.max_distance + 1
+                for stored in self._entries:
+                    distance = hamming(key, stored)
+                    if distance < best_distance:
+                        best_key, best_distance = stored, distance
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self.near_hits += 1
+                    return self._entries[best_key]
+            self.misses += 1
+            return None
+
+    def put(self, key, prediction):
+        with self._lock:
+            self._entries[key] = np.array(prediction, copy=True)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "cache_size": len(self._entries),
+            "cache_capacity": self.capacity,
+            "cache_hits": self.hits,
+            "cache_near_hits": self.near_hits,
+            "cache_misses": self.misses,
+            "cache_evictions": self.evictions,
+            "cache_hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+        }
+
+
+def cached_predict(model, img_array, cache=None):
+    # img_array is a single preprocessed image without the batch dimension
+    if cache is None:
+        return model.predict(np.expand_dims(img_array, axis=0))[0]
+    key = cache.key(img_array)
+    prediction = cache.get(key)
+    if prediction is None:
+        prediction = model.predict(np.expand_dims(img_array, axis=0))[0]
+        cache.put(key, prediction)
+    return prediction
@@ -0,0 +1,178 @@
+"""Fast preprocessing path for the classifier input.
+
+Compared to classifier.preprocess_image (the original prediction-block code):
+- Optionally (AIRWASTE_JPEG_DRAFT=1), JPEGs are decoded at reduced scale
+  (libjpeg DCT scaling via Image.draft), close to the model's input size,
+  instead of at full camera resolution. This is faster but changes the model
+  input by up to DRAFT_MAX_DIFF per pixel, so it is off by default.
+- The resize filter is configurable (AIRWASTE_RESIZE_FILTER).
+- uint8 pixels are normalised straight to float32, optionally into a
+  preallocated buffer, instead of /255.0 producing a float64 copy.
+- Grayscale models get an (h, w, 1) array.
+
+Run `python preprocessing.py [images...]` to check numerical parity with
+classifier.preprocess_image (synthetic JPEGs are used when no paths are given);
+tests/test_preprocessing.py asserts the same bounds.
+"""
+import functools
+import io
+import os
+import sys
+import threading
+
+import numpy as np
+from PIL import Image
+
+import classifier
+import metrics
+
+RESIZE_FILTERS = {
+    "nearest": Image.NEAREST,
+    "bilinear": Image.BILINEAR,
+    "bicubic": Image.BICUBIC,
+    "lanczos": Image.LANCZOS,
+    "box": Image.BOX,
+    "hamming": Image.HAMMING,
+}
+# Bicubic is what Image.resize used in the original prediction block
+RESIZE_FILTER = os.environ.get("AIRWASTE_RESIZE_FILTER", "bicubic")
+JPEG_DRAFT = os.environ.get("AIRWASTE_JPEG_DRAFT", "0") == "1"
+# Parity bounds against classifier.preprocess_image, on the 0-1 input scale
+EXACT_MAX_DIFF = 1e-6
+DRAFT_MAX_DIFF = 0.15
+DRAFT_MEAN_DIFF = 0.01
+
+_SCALE = np.float32(255)
+
+
+class Preprocessor:
+    def __init__(self, input_shape, resize_filter=RESIZE_FILTER, draft=JPEG_DRAFT):
+        self.height, self.width, self.channels = (int(d) for d in input_shape[1:4])
+        self.mode = "L" if self.channels == 1 else "RGB"
+        self.resize_filter = resize_filter
+        self.resample = RESIZE_FILTERS[resize_filter]
+        self.draft = draft
+        # Reusable float32 buffers, one set per thread
+        self._local = threading.local()
+
+    def decode(self, img):
+        # PIL image (or path / file object) -> uint8 array of the model's input size
+        if not isinstance(img, Image.Image):
+            with Image.open(img) as opened:
+                return self.decode(opened)
+        with metrics.timer("decode"):
+            if self.draft and img.format == "JPEG":
+                # Picks the largest 1/2, 1/4, 1/8 scale that stays >= the target size
+                img.draft(self.mode, (self.width, self.height))
+            img.load()
+        with metrics.timer("resize"):
+            if img.mode != self.mode:
+                img = img.convert(self.mode)
+            if img.size != (self.width, self.height):
+                img = img.resize((self.width, self.height), self.resample)
+            pixels = np.asarray(img, dtype=np.uint8)
+        if self.channels == 1:
+            pixels = pixels[..., np.newaxis]
+        return pixels
+
+    def normalize(self, pixels, out=None):
+        if out is None:
+            out = np.empty(pixels.shape, dtype=np.float32)
+        return np.divide(pixels, _SCALE, out=out, dtype=np.float32)
+
+    def _buffer(self, name, shape):
+        buffer = getattr(self._local, name, None)
+        if buffer is None or buffer.shape[0] < shape[0]:
+            buffer = np.empty(shape, dtype=np.float32)
+            setattr(self._local, name, buffer)
+        return buffer[: shape[0]]
+
+    def __call__(self, img, reuse=False):
+        # reuse=True writes into this thread's frame buffer, which the next
+        # call on the same thread overwrites
+        pixels = self.decode(img)
+        out = self._buffer("frame", (1, *pixels.shape))[0] if reuse else None
+        with metrics.timer("normalize"):
+            return self.normalize(pixels, out=out)
+
+    def normalize_batch(self, pixel_arrays):
+        # Stack decoded uint8 frames into this thread's reusable batch buffer
+        batch = self._buffer("batch", (len(pixel_arrays), self.height, self.width, self.channels))
+        with metrics.timer("normalize"):
+            for i, pixels in enumerate(pixel_arrays):
+                self.normalize(pixels, out=batch[i])
+        return batch
+
+
+@functools.lru_cache(maxsize=None)
+def get_preprocessor(input_shape, resize_filter=RESIZE_FILTER, draft=JPEG_DRAFT):
+    return Preprocessor(tuple(input_shape), resize_filter, draft)
+
+
+def decode_file(path, input_shape):
+    # Module-level so it can run in a ProcessPoolExecutor
+    return get_preprocessor(tuple(input_shape)).decode(path)
+
+
+def _synthetic_jpegs(count=8, size=(1280, 720), seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        # Smooth gradients plus noise, closer to camera frames than pure noise
+        y, x = np.mgrid[0 : size[1], 0 : size[0]]
+        base = np.stack([(x * (i + 1)) % 256, (y * (i + 2)) % 256, ((x + y) * 3) % 256], axis=-1)
+        pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+        buffer.seek(0)
+        yield f"synthetic-{i}.jpg", buffer.getvalue()
+
+
+def check_parity(sources, input_shape):
+    # Compares against the original prediction-block preprocessing.
+    # Without draft decoding the output must match to float32 precision;
+    # draft decoding changes the pixels slightly and is held to the DRAFT_* bounds.
+    exact = Preprocessor(input_shape, draft=False)
+    fast = Preprocessor(input_shape, draft=True)
+    report = []
+    for name, data in sources:
+        reference = classifier.preprocess_image(Image.open(io.BytesIO(data)), input_shape)
+        no_draft = exact(Image.open(io.BytesIO(data)))
+        drafted = fast(Image.open(io.BytesIO(data)))
+        report.append({
+            "image": name,
+            "dtype": str(no_draft.dtype),
+            "shape_ok": no_draft.shape == reference.shape == drafted.shape,
+            "max_abs_diff": float(np.max(np.abs(no_draft - reference))),
+            "draft_max_abs_diff": float(np.max(np.abs(drafted - reference))),
+            "draft_mean_abs_diff": float(np.mean(np.abs(drafted - reference))),
+        })
+    return report
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    shapes = [(None, 224, 224, 3), (None, 224, 224, 1)]
+    if argv:
+        sources = []
+        for path in argv:
+            with open(path, "rb") as f:
+                sources.append((path, f.read()))
+    else:
+        sources = list(_synthetic_jpegs())
+
+    failed = False
+    for input_shape in shapes:
+        for row in check_parity(sources, input_shape):
+            ok = (row["shape_ok"] and row["dtype"] == "float32" and row["max_abs_diff"] < EXACT_MAX_DIFF
+                  and row["draft_max_abs_diff"] <= DRAFT_MAX_DIFF and row["draft_mean_abs_diff"] <= DRAFT_MEAN_DIFF)
+            failed |= not ok
+            print(
+                f"{'OK  ' if ok else 'FAIL'} {row['image']} {input_shape[1:]}: "
+                f"max |diff| {row['max_abs_diff']:.2e}, with JPEG draft max {row['draft_max_abs_diff']:.3f} "
+                f"/ mean {row['draft_mean_abs_diff']:.4f}"
+            )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
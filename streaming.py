@@ -0,0 +1,233 @@
+import collections
+import os
+import threading
+import time
+
+import cv2
+from PIL import Image
+
+import classifier
+import inference_service
+import metrics
+import prediction_cache
+import preprocessing
+
+# A stream whose browser session has not checked in for this many seconds is
+# stopped (tab closed). Hidden tabs may only tick once a minute, hence the margin.
+STREAM_HEARTBEAT_TIMEOUT = float(os.environ.get("AIRWASTE_STREAM_HEARTBEAT_TIMEOUT", "90"))
+
+
+def parse_source(source):
+    # "0", "1".. are camera devices; anything else is a file path or stream URL
+    if isinstance(source, str) and source.strip().isdigit():
+        return int(source)
+    return source
+
+
+def open_capture(source):
+    source = parse_source(source)
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise RuntimeError(f"Could not open video source {source!r}")
+    return capture
+
+
+class LatestFrameQueue:
+    # Bounded to one slot: a new frame replaces the unconsumed one, so a slow
+    # consumer always sees the freshest frame instead of a growing backlog.
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if self._item is None:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+
+class RateMeter:
+    # Events per second over a sliding window
+    def __init__(self, window=2.0):
+        self.window = window
+        self._times = collections.deque()
+
+    def tick(self, now=None):
+        now = time.perf_counter() if now is None else now
+        self._times.append(now)
+        while self._times and now - self._times[0] > self.window:
+            self._times.popleft()
+
+    @property
+    def rate(self):
+        if len(self._times) < 2:
+            return 0.0
+        span = self._times[-1] - self._times[0]
+        return (len(self._times) - 1) / span if span > 0 else 0.0
+
+
+class StreamClassifier:
+    def __init__(self, model, source, realtime=True, gate=None, cache=None, events=None,
+                 heartbeat_timeout=STREAM_HEARTBEAT_TIMEOUT):
+        self.model = model
+        self.source = parse_source(source)
+        self.cache = cache
+        # Optional event_store.EventLog that records one event per item
+        self.events = events
+        self._logged_label = None
+        # Optional motion_gate.MotionGate: unchanged frames never reach the model
+        self.gate = gate
+        self.latest_frame = None
+        # Pace video files at their native FPS instead of decoding as fast as possible
+        self.realtime = realtime
+        # 0 disables the check (CLI / tests without a session)
+        self.heartbeat_timeout = heartbeat_timeout
+        self.heartbeat = time.monotonic()
+        self.frames = LatestFrameQueue()
+        self.result = None
+        self.error = None
+        self.frames_read = 0
+        self.inferences = 0
+        self.capture_fps = RateMeter()
+        self.inference_fps = RateMeter()
+        self.latencies_ms = collections.deque(maxlen=200)
+        self.last_stages = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        capture = open_capture(self.source)
+        self._threads = [
+            threading.Thread(target=self._read_loop, args=(capture,), name="stream-reader", daemon=True),
+            threading.Thread(target=self._infer_loop, name="stream-inference", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2)
+
+    def touch(self):
+        # Called by the owning session on every render
+        self.heartbeat = time.monotonic()
+
+    @property
+    def running(self):
+        return any(t.is_alive() for t in self._threads) and not self._stop.is_set()
+
+    def _read_loop(self, capture):
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0
+        # Only video files are paced; cameras and RTSP streams block in read()
+        # and sleeping on top of that lets stale frames pile up in their buffer
+        is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        frame_interval = 1.0 / fps if self.realtime and fps > 0 and is_file else 0
+        try:
+            while not self._stop.is_set():
+                if self.heartbeat_timeout and time.monotonic() - self.heartbeat > self.heartbeat_timeout:
+                    # The session that owns this stream is gone: free the device
+                    self.error = f"no heartbeat from the browser session for {self.heartbeat_timeout:.0f}s"
+                    break
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                captured_at = time.perf_counter()
+                self.frames_read += 1
+                self.capture_fps.tick(captured_at)
+                self.latest_frame = frame
+                if self.gate is None or self.gate.should_classify(frame):
+                    self.frames.put((frame, captured_at))
+                if frame_interval:
+                    time.sleep(frame_interval)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            capture.release()
+            self._stop.set()
+
+    def classify_frame(self, frame):
+        img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        # Only the inference thread calls this, so the reusable frame buffer is safe
+        with metrics.timer("preprocess") as preprocess_timer:
+            img_array = preprocessing.get_preprocessor(tuple(self.model.input_shape))(img, reuse=True)
+        # A frame released by the motion gate is a new item by definition, so
+        # it never takes an earlier frame's verdict from the cache
+        cache = self.cache if self.gate is None else None
+        with metrics.timer("predict") as predict_timer:
+            prediction = prediction_cache.cached_predict(self.model, img_array, cache)
+        self.last_stages = {"preprocess_ms": preprocess_timer.ms, "predict_ms": predict_timer.ms}
+        return prediction
+
+    def _infer_loop(self):
+        while not self._stop.is_set():
+            item = self.frames.get(timeout=0.1)
+            if item is None:
+                continue
+            frame, captured_at = item
+            try:
+                prediction = self.classify_frame(frame)
+            except inference_service.ServiceBusy:
+                # Shared service is saturated. Ungated, this is just another
+                # stale frame; a gated frame is the only one released for the
+                # new item, so the gate has to release the next settled frame
+                self.frames.dropped += 1
+                if self.gate is not None:
+                    self.gate.rearm()
+                continue
+            except Exception as e:
+                self.error = str(e)
+                self._stop.set()
+                break
+            done_at = time.perf_counter()
+            predicted_label, confidence = classifier.label_prediction(prediction)
+            metrics.inc("predictions_total", label=predicted_label)
+            metrics.observe("stream_end_to_end", (done_at - captured_at) * 1000)
+            # A gated frame is one new item; ungated, every frame of an item
+            # sitting in view is inferred, so only a change of verdict is logged
+            if self.events is not None and (self.gate is not None or predicted_label != self._logged_label):
+                self._logged_label = predicted_label
+                self.events.append(prediction, source="stream",
+                                   stages={**self.last_stages, "total_ms": (done_at - captured_at) * 1000})
+            with self._lock:
+                self.inferences += 1
+                self.inference_fps.tick(done_at)
+                self.latencies_ms.append((done_at - captured_at) * 1000)
+                self.result = {
+                    "label": predicted_label,
+                    "confidence": confidence,
+                    "prediction": prediction,
+                    "seq": self.inferences,
+                    "frame": frame,
+                }
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies_ms)
+            stats = {
+                "result": self.result,
+                "latest_frame": self.latest_frame,
+                "error": self.error,
+                "frames_read": self.frames_read,
+                "frames_dropped": self.frames.dropped,
+                "inferences": self.inferences,
+                "capture_fps": self.capture_fps.rate,
+                "inference_fps": self.inference_fps.rate,
+                "latency_p50_ms": latencies[len(latencies) // 2] if latencies else 0.0,
+                "latency_p95_ms": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            }
+        if self.gate is not None:
+            stats.update(self.gate.stats())
+        return stats
@@ -0,0 +1,59 @@
+import importlib
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import classifier
+import preprocessing
+
+SHAPES = [(None, 224, 224, 3), (None, 224, 224, 1)]
+SOURCES = list(preprocessing._synthetic_jpegs())
+
+
+def _reference(data, input_shape):
+    return classifier.preprocess_image(Image.open(io.BytesIO(data)), input_shape)
+
+
+@pytest.mark.parametrize("input_shape", SHAPES)
+@pytest.mark.parametrize("name,data", SOURCES)
+def test_matches_original_without_draft(name, data, input_shape):
+    reference = _reference(data, input_shape)
+    output = preprocessing.Preprocessor(input_shape, draft=False)(Image.open(io.BytesIO(data)))
+    assert output.dtype == np.float32
+    assert output.shape == reference.shape
+    assert np.max(np.abs(output - reference)) < preprocessing.EXACT_MAX_DIFF
+
+
+@pytest.mark.parametrize("input_shape", SHAPES)
+@pytest.mark.parametrize("name,data", SOURCES)
+def test_draft_within_tolerance(name, data, input_shape):
+    reference = _reference(data, input_shape)
+    output = preprocessing.Preprocessor(input_shape, draft=True)(Image.open(io.BytesIO(data)))
+    assert output.shape == reference.shape
+    diff = np.abs(output - reference)
+    assert diff.max() <= preprocessing.DRAFT_MAX_DIFF
+    assert diff.mean() <= preprocessing.DRAFT_MEAN_DIFF
+
+
+def test_batch_matches_single():
+    input_shape = SHAPES[0]
+    preprocessor = preprocessing.Preprocessor(input_shape, draft=False)
+    pixels = [preprocessor.decode(Image.open(io.BytesIO(data))) for _, data in SOURCES[:4]]
+    batch = preprocessor.normalize_batch(pixels)
+    for i, data in enumerate(SOURCES[:4]):
+        np.testing.assert_array_equal(batch[i], preprocessor(Image.open(io.BytesIO(data[1]))))
+
+
+def test_draft_is_opt_in(monkeypatch):
+    # Defaults are read from the environment at import time
+    monkeypatch.delenv("AIRWASTE_JPEG_DRAFT", raising=False)
+    try:
+        module = importlib.reload(preprocessing)
+        assert module.JPEG_DRAFT is False
+        assert module.Preprocessor(SHAPES[0]).draft is False
+        assert module.get_preprocessor(SHAPES[0]).draft is False
+    finally:
+        monkeypatch.undo()
+        importlib.reload(preprocessing)
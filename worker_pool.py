@@ -0,0 +1,425 @@
+"""Multi-process inference: one model copy per worker process.
+
+A single process cannot keep a many-core aggregation server busy with
+predict(). WorkerPool starts N worker processes that each load the model once
+(through backends.load_backend) with their own TensorFlow intra/inter-op
+thread counts. Preprocessed batches travel through a per-worker
+multiprocessing.shared_memory ring of input and output slots, so only a
+(slot, count) message is pickled per batch.
+
+    AIRWASTE_POOL_WORKERS=8 AIRWASTE_POOL_INTRA_THREADS=4 streamlit run app.py
+    python worker_pool.py --workers 1,2,4,8,16 --seconds 10   # scaling report
+"""
+import argparse
+import atexit
+import json
+import multiprocessing as mp
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import backends
+from classifier import MODEL_PATH
+
+POOL_WORKERS = int(os.environ.get("AIRWASTE_POOL_WORKERS", "0"))  # 0 = run in-process
+POOL_INTRA_THREADS = int(os.environ.get("AIRWASTE_POOL_INTRA_THREADS", "0")) or None
+POOL_INTER_THREADS = int(os.environ.get("AIRWASTE_POOL_INTER_THREADS", "0")) or None
+POOL_SLOTS = int(os.environ.get("AIRWASTE_POOL_SLOTS", "2"))  # ring depth per worker
+POOL_SLOT_BATCH = int(os.environ.get("AIRWASTE_POOL_SLOT_BATCH", "32"))  # images per slot
+POOL_START_TIMEOUT = float(os.environ.get("AIRWASTE_POOL_START_TIMEOUT", "300"))
+# Max wait for a free ring slot and for a batch's result, in seconds
+POOL_TIMEOUT = float(os.environ.get("AIRWASTE_POOL_TIMEOUT", "30"))
+POOL_HEALTH_INTERVAL = 0.5  # how often the collector checks that workers are alive
+
+
+def _configure_threads(intra_threads, inter_threads):
+    # Must run before TensorFlow is imported in the worker; the tf.config
+    # calls below cover builds that ignore the environment variables
+    if intra_threads:
+        os.environ["OMP_NUM_THREADS"] = str(intra_threads)
+        os.environ["TF_NUM_INTRAOP_THREADS"] = str(intra_threads)
+    if inter_threads:
+        os.environ["TF_NUM_INTEROP_THREADS"] = str(inter_threads)
+
+
+def load_worker_model(kind, model_path, tflite_path, intra_threads, inter_threads, standin_shape=None):
+    # Runs inside each worker. standin_shape builds benchmark.py's stand-in
+    # model when the .h5 is missing (scaling reports on a dev box)
+    if kind in ("keras", "savedmodel"):
+        import tensorflow as tf
+
+        if intra_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_threads)
+        if inter_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_threads)
+    if standin_shape and kind == "keras" and not os.path.exists(model_path):
+        import benchmark
+
+        return benchmark.build_standin_model(standin_shape), None
+    if kind == "savedmodel":
+        return backends.load_backend(kind, savedmodel_path=model_path)
+    return backends.load_backend(kind, model_path, tflite_path, intra_threads)
+
+
+def _worker_main(index, load, load_args, intra_threads, inter_threads, tasks, results):
+    _configure_threads(intra_threads, inter_threads)
+    try:
+        model, error = load(*load_args)
+        if error:
+            results.put(("error", index, error))
+            return
+        # Also the warm-up: the first predict() traces the graph
+        probe = model.predict(np.zeros((1, *model.input_shape[1:]), dtype=np.float32))
+    except Exception as e:
+        results.put(("error", index, str(e)))
+        return
+    results.put(("ready", index, tuple(model.input_shape), probe.shape[1:]))
+
+    message = tasks.get()
+    if message is None:
+        return
+    _, input_name, output_name, slots, slot_batch = message
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    inputs = np.ndarray((slots, slot_batch, *model.input_shape[1:]), np.float32, buffer=input_shm.buf)
+    outputs = np.ndarray((slots, slot_batch, *probe.shape[1:]), np.float32, buffer=output_shm.buf)
+    try:
+        while True:
+            message = tasks.get()
+            if message is None:
+                break
+            slot, count = message
+            try:
+                outputs[slot, :count] = model.predict(inputs[slot, :count])
+                results.put(("done", index, slot, None))
+            except Exception as e:
+                results.put(("done", index, slot, str(e)))
+    finally:
+        del inputs, outputs
+        input_shm.close()
+        output_shm.close()
+
+
+class _Worker:
+    def __init__(self, index, process, tasks):
+        self.index = index
+        self.process = process
+        self.tasks = tasks
+        self.input_shm = None
+        self.output_shm = None
+        self.inputs = None
+        self.outputs = None
+        self.free_slots = queue.Queue()
+        self.pending = {}  # slot -> (future, count)
+        self.in_flight = 0
+        self.dead = False
+        self.batches = 0
+        self.images = 0
+
+
+class WorkerPool:
+    # Same predict(batch) / input_shape / name surface as the backends, and
+    # safe to call from several threads at once: each call takes a free ring
+    # slot on the least-busy worker. Batches larger than one slot are split
+    # across workers.
+
+    def __init__(
+        self,
+        kind=backends.BACKEND,
+        model_path=MODEL_PATH,
+        workers=POOL_WORKERS,
+        intra_threads=POOL_INTRA_THREADS,
+        inter_threads=POOL_INTER_THREADS,
+        slots=POOL_SLOTS,
+        slot_batch=POOL_SLOT_BATCH,
+        tflite_path=backends.TFLITE_PATH,
+        standin_shape=None,
+        load=load_worker_model,
+        timeout=POOL_TIMEOUT,
+    ):
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.intra_threads = intra_threads
+        self.inter_threads = inter_threads
+        self.slots = slots
+        self.slot_batch = slot_batch
+        self.timeout = timeout
+        self.name = f"{kind}, {self.workers} worker processes"
+        # Concurrent predict() calls that keep every ring slot busy (see InferenceService)
+        self.concurrency = self.workers * slots
+        self.input_shape = None
+        self._load = load
+        self._load_args = (kind, model_path, tflite_path, intra_threads, inter_threads, standin_shape)
+        self._workers = []
+        self._results = None
+        self._collector = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self, timeout=POOL_START_TIMEOUT):
+        # Spawn, not fork: the parent may already hold TensorFlow / Streamlit threads
+        context = mp.get_context("spawn")
+        self._results = context.Queue()
+        for index in range(self.workers):
+            tasks = context.Queue()
+            process = context.Process(
+                target=_worker_main,
+                args=(index, self._load, self._load_args, self.intra_threads, self.inter_threads, tasks, self._results),
+                name=f"inference-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self._workers.append(_Worker(index, process, tasks))
+
+        deadline = time.monotonic() + timeout
+        output_shape = None
+        started = 0
+        while started < self.workers:
+            try:
+                message = self._results.get(timeout=POOL_HEALTH_INTERVAL)
+            except queue.Empty:
+                dead = [w for w in self._workers if not w.process.is_alive()]
+                if dead:
+                    self.stop()
+                    raise RuntimeError(f"Inference worker {dead[0].index} exited while loading the model "
+                                       f"(exit code {dead[0].process.exitcode})")
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"Inference workers did not start within {timeout:.0f}s")
+                continue
+            started += 1
+            if message[0] == "error":
+                self.stop()
+                raise RuntimeError(f"Inference worker {message[1]} failed to load the model: {message[2]}")
+            _, _, self.input_shape, output_shape = message
+
+        item_shape = self.input_shape[1:]
+        for worker in self._workers:
+            worker.input_shm = shared_memory.SharedMemory(
+                create=True, size=4 * self.slots * self.slot_batch * int(np.prod(item_shape)))
+            worker.output_shm = shared_memory.SharedMemory(
+                create=True, size=4 * self.slots * self.slot_batch * int(np.prod(output_shape)))
+            worker.inputs = np.ndarray((self.slots, self.slot_batch, *item_shape), np.float32, buffer=worker.input_shm.buf)
+            worker.outputs = np.ndarray((self.slots, self.slot_batch, *output_shape), np.float32, buffer=worker.output_shm.buf)
+            for slot in range(self.slots):
+                worker.free_slots.put(slot)
+            worker.tasks.put(("attach", worker.input_shm.name, worker.output_shm.name, self.slots, self.slot_batch))
+
+        self._collector = threading.Thread(target=self._collect, name="worker-pool-results", daemon=True)
+        self._collector.start()
+        # Shared memory outlives the process unless it is unlinked
+        atexit.register(self.stop)
+        return self
+
+    def _collect(self):
+        next_check = time.monotonic() + POOL_HEALTH_INTERVAL
+        while True:
+            try:
+                message = self._results.get(timeout=POOL_HEALTH_INTERVAL)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                break
+            if message:
+                self._finish(*message[1:])
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + POOL_HEALTH_INTERVAL
+
+    def _finish(self, index, slot, error):
+        worker = self._workers[index]
+        with self._lock:
+            if worker.dead or slot not in worker.pending:
+                return
+            future, count = worker.pending.pop(slot)
+            worker.in_flight -= count
+            worker.batches += 1
+            worker.images += count
+        if error is None:
+            future.set_result(worker.outputs[slot, :count].copy())
+        else:
+            future.set_exception(RuntimeError(f"worker {index}: {error}"))
+        worker.free_slots.put(slot)
+
+    def _check_workers(self):
+        # A killed worker (e.g. by the OOM killer) never answers: fail its
+        # pending batches and stop routing work to it
+        for worker in self._workers:
+            if worker.dead or worker.process.is_alive():
+                continue
+            with self._lock:
+                if self._closed:
+                    return
+                worker.dead = True
+                pending = list(worker.pending.values())
+                worker.pending.clear()
+                worker.in_flight = 0
+            error = RuntimeError(f"Inference worker {worker.index} died (exit code {worker.process.exitcode})")
+            for future, _ in pending:
+                future.set_exception(error)
+            # Wakes every submit() waiting for one of its slots
+            worker.free_slots.put(None)
+
+    def submit(self, batch):
+        # One slot's worth of images -> Future of the predictions
+        count = len(batch)
+        if count > self.slot_batch:
+            raise ValueError(f"batch of {count} exceeds the slot size {self.slot_batch}")
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Worker pool is stopped")
+            alive = [w for w in self._workers if not w.dead]
+            if not alive:
+                raise RuntimeError("All inference workers have died")
+            worker = min(alive, key=lambda w: w.in_flight)
+            worker.in_flight += count
+        try:
+            slot = worker.free_slots.get(timeout=self.timeout)
+        except queue.Empty:
+            slot = None
+        if slot is None:
+            with self._lock:
+                if not worker.dead:
+                    worker.in_flight -= count
+                    raise TimeoutError(f"No free slot on inference worker {worker.index} within {self.timeout:.0f}s")
+            worker.free_slots.put(None)
+            raise RuntimeError(f"Inference worker {worker.index} died")
+        worker.inputs[slot, :count] = batch
+        future = Future()
+        with self._lock:
+            if worker.dead:
+                raise RuntimeError(f"Inference worker {worker.index} died")
+            worker.pending[slot] = (future, count)
+        worker.tasks.put((slot, count))
+        return future
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        # Spread a large batch over the workers, never more than a slot each
+        chunk = min(self.slot_batch, max(1, -(-len(batch) // self.workers)))
+        futures = [self.submit(batch[i:i + chunk]) for i in range(0, len(batch), chunk)]
+        return np.concatenate([f.result(timeout=self.timeout) for f in futures])
+
+    def stop(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        for worker in self._workers:
+            worker.tasks.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        if self._collector is not None:
+            self._results.put(None)
+            self._collector.join(timeout=2)
+        for worker in self._workers:
+            worker.inputs = worker.outputs = None
+            for shm in (worker.input_shm, worker.output_shm):
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pool_workers": self.workers,
+                "pool_alive": sum(w.process.is_alive() for w in self._workers),
+                "pool_dead": sum(w.dead for w in self._workers),
+                "pool_in_flight": sum(w.in_flight for w in self._workers),
+                **{f"pool_worker{w.index}_images": w.images for w in self._workers},
+            }
+
+
+def load_pool(kind=backends.BACKEND, model_path=MODEL_PATH, workers=POOL_WORKERS, **kwargs):
+    try:
+        return WorkerPool(kind, model_path, workers, **kwargs).start(), None
+    except Exception as e:
+        return None, str(e)
+
+
+def measure(pool, seconds, batch_size, clients):
+    # Closed loop: `clients` threads each keep one batch in flight
+    batch = np.random.default_rng(0).random((batch_size, *pool.input_shape[1:]), dtype=np.float32)
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + seconds
+
+    def client():
+        local = []
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            pool.predict(batch)
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "images_per_sec": len(latencies) * batch_size / elapsed,
+        "batch_p50_ms": latencies[len(latencies) // 2] if latencies else 0.0,
+        "batch_p95_ms": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Throughput of the multi-process pool versus worker count.")
+    parser.add_argument("--backend", choices=backends.BACKENDS, default=backends.BACKEND)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--input-shape", default="224,224,3", help="Stand-in model input shape when the .h5 is missing")
+    parser.add_argument("--workers", default="1,2,4,8", help="Worker counts to measure")
+    parser.add_argument("--intra-threads", type=int, default=POOL_INTRA_THREADS,
+                        help="TF intra-op threads per worker (default: cores / workers)")
+    parser.add_argument("--inter-threads", type=int, default=POOL_INTER_THREADS or 1)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args(argv)
+
+    standin_shape = tuple(int(d) for d in args.input_shape.split(","))
+    cores = os.cpu_count() or 1
+    report = {"cpu_count": cores, "backend": args.backend, "batch_size": args.batch_size, "runs": []}
+    print(f"{'workers':>7} {'intra':>5} {'images/s':>10} {'speedup':>8} {'efficiency':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    base = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        intra = args.intra_threads or max(1, cores // workers)
+        pool, error = load_pool(args.backend, args.model, workers, intra_threads=intra, inter_threads=args.inter_threads,
+                                slot_batch=args.batch_size, standin_shape=standin_shape)
+        if error:
+            print(f"Error starting {workers} workers: {error}", file=sys.stderr)
+            return 1
+        try:
+            measure(pool, min(2.0, args.seconds), args.batch_size, pool.concurrency)  # warm-up
+            run = measure(pool, args.seconds, args.batch_size, pool.concurrency)
+        finally:
+            pool.stop()
+        base = base or run["images_per_sec"]
+        speedup = run["images_per_sec"] / base
+        run.update(workers=workers, intra_threads=intra, speedup=speedup, efficiency=speedup / workers)
+        report["runs"].append(run)
+        print(f"{workers:>7} {intra:>5} {run['images_per_sec']:>10.1f} {speedup:>7.2f}x {run['efficiency'] * 100:>9.0f}% "
+              f"{run['batch_p50_ms']:>8.1f} {run['batch_p95_ms']:>8.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())